@@ -1,8 +1,1055 @@
 import os
+import sys
+import warnings
+import argparse
+import asyncio
+import collections
 import csv
+import functools
+import glob
+import hashlib
+import html
+import io
+import importlib.util
+import json
+import re
+import numpy as np
 import pandas as pd
-import math
 import shutil
+import time
+import threading
+import uuid
+import tracemalloc
+import cProfile
+import contextlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows; the process peak memory is then left out of the stage records
+    resource = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def process_max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and the BSDs but in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class StageRecorder:
+    # collects wall time, rows and bytes read and written of each instrumented stage, along with the
+    # process's maximum resident set size so far. Every record is appended to report_path as a JSON
+    # line, and the totals per stage are kept in memory for the summary table. profile_path and
+    # trace_memory turn on the costlier cProfile and tracemalloc captures, meant for a single run;
+    # only tracemalloc gives a peak memory per stage
+    def __init__(self, report_path=None, profile_path=None, trace_memory=False):
+        self.report_path = report_path
+        self.profile_path = profile_path
+        self.trace_memory = trace_memory
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._open_stages = 0
+        self._report_file = open(report_path, mode='a', buffering=1) if report_path else None
+        self._profiler = None
+        if profile_path:
+            # cProfile only sees the thread that enabled it, so profile with a single worker
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        record = {'stage': name, **fields, 'rows': 0, 'bytes_read': 0, 'bytes_written': 0}
+        if self.trace_memory:
+            with self._lock:
+                # the traced peak is process-wide, so it is only reset when no other stage is running
+                if self._open_stages == 0:
+                    tracemalloc.reset_peak()
+                self._open_stages += 1
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            record['started'] = started
+            record['thread'] = threading.current_thread().name
+            if resource is not None:
+                # high-water mark of the whole process since it started, not of this stage
+                record['process_max_rss_bytes'] = process_max_rss_bytes()
+            if self.trace_memory:
+                record['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            self._add(record)
+
+    def _add(self, record):
+        with self._lock:
+            if self.trace_memory:
+                self._open_stages -= 1
+            totals = self.totals.setdefault(record['stage'], {
+                'stage': record['stage'], 'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                'rows': 0, 'bytes_read': 0, 'bytes_written': 0, 'traced_peak_bytes': None,
+                'process_max_rss_bytes': None})
+            totals['calls'] += 1
+            totals['seconds'] += record['seconds']
+            totals['max_seconds'] = max(totals['max_seconds'], record['seconds'])
+            for key in ('rows', 'bytes_read', 'bytes_written'):
+                totals[key] += int(record[key])
+            for key in ('traced_peak_bytes', 'process_max_rss_bytes'):
+                if key in record:
+                    totals[key] = max(totals[key] or 0, record[key])
+            if self._report_file is not None:
+                self._report_file.write(json.dumps(record, default=str) + "\n")
+
+    def summary(self):
+        # one row per stage, slowest first
+        columns = ['stage', 'calls', 'seconds', 'max_seconds', 'rows', 'bytes_read', 'bytes_written',
+                   'traced_peak_bytes', 'process_max_rss_bytes']
+        with self._lock:
+            summary = pd.DataFrame(list(self.totals.values()), columns=columns)
+        return summary.sort_values(by=['seconds'], ascending=False, kind='stable').reset_index(drop=True)
+
+    def print_summary(self):
+        # the stage peak is only known with trace_memory; max RSS is the process high-water mark
+        def megabytes(value):
+            return "-" if value is None or pd.isna(value) else f"{value / 2 ** 20:.1f}"
+
+        print(f"{'stage':<40}{'calls':>7}{'seconds':>10}{'rows':>12}{'MB read':>10}{'MB written':>12}"
+              f"{'peak MB':>10}{'max RSS MB':>12}")
+        for row in self.summary().itertuples(index=False):
+            print(f"{row.stage:<40}{row.calls:>7}{row.seconds:>10.3f}{row.rows:>12}{row.bytes_read / 2 ** 20:>10.1f}"
+                  f"{row.bytes_written / 2 ** 20:>12.1f}{megabytes(row.traced_peak_bytes):>10}"
+                  f"{megabytes(row.process_max_rss_bytes):>12}")
+
+    def close(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if self._report_file is not None:
+            self._report_file.close()
+            self._report_file = None
+
+
+# the active StageRecorder; instrumentation is off while this is None
+_stage_recorder = None
+
+
+def enable_instrumentation(report_path=None, profile_path=None, trace_memory=False):
+    global _stage_recorder
+    disable_instrumentation()
+    _stage_recorder = StageRecorder(report_path, profile_path, trace_memory)
+    return _stage_recorder
+
+
+def disable_instrumentation():
+    # stop recording and return the recorder that was active, so its summary can still be read
+    global _stage_recorder
+    recorder = _stage_recorder
+    _stage_recorder = None
+    if recorder is not None:
+        recorder.close()
+    return recorder
+
+
+def map_in_threads(func, items, max_workers=None):
+    # func applied to every item in a thread pool; a single worker runs in the calling thread,
+    # which keeps it inside a cProfile capture
+    if max_workers == 1:
+        return list(map(func, items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, items))
+
+
+def stage(name, **fields):
+    # context manager around one stage of work. It yields a dict where the stage sets 'rows',
+    # 'bytes_read' and 'bytes_written'; without an active recorder that dict is simply dropped
+    recorder = _stage_recorder
+    if recorder is None:
+        return contextlib.nullcontext({'rows': 0, 'bytes_read': 0, 'bytes_written': 0})
+    return recorder.stage(name, **fields)
+
+
+def normalize_usernames(usernames):
+    # build the case-insensitive key used to match usernames between files
+    return usernames.astype("string").str.strip().str.casefold()
+
+
+def normalize_username(username):
+    # same key as normalize_usernames, for a single username
+    return str(username).strip().casefold()
+
+
+class RosterIndex:
+    # normalized username -> row position in the gradebook, so roster lookups are O(1) per student
+    def __init__(self, positions=None, size=0, extra_positions=None):
+        self.positions = {} if positions is None else positions
+        self.size = size
+        # further rows of usernames that appear more than once in the gradebook
+        self.extra_positions = {} if extra_positions is None else extra_positions
+
+    @classmethod
+    def from_usernames(cls, usernames):
+        index = cls(size=len(usernames))
+        keys = normalize_usernames(pd.Series(usernames)).to_numpy(dtype=object, na_value=None)
+        for position, key in enumerate(keys):
+            if key is None:
+                continue
+            if key in index.positions:
+                index.extra_positions.setdefault(key, []).append(position)
+            else:
+                index.positions[key] = position
+        return index
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['positions'], data['size'], data['extra_positions'])
+
+    def to_dict(self):
+        return {'positions': self.positions, 'size': self.size, 'extra_positions': self.extra_positions}
+
+    def __contains__(self, username):
+        return normalize_username(username) in self.positions
+
+    def insert(self, username):
+        # give username the next row at the end of the gradebook
+        key = normalize_username(username)
+        if key in self.positions:
+            raise ValueError(f"The username '{username}' is already in the roster.")
+        self.positions[key] = self.size
+        self.size += 1
+
+    def lookup(self, keys):
+        # row positions of already normalized keys, -1 where the key is not in the roster
+        keys = pd.Series(keys).to_numpy(dtype=object, na_value=None)
+        return np.fromiter((self.positions.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+
+    def reordered(self, order):
+        # index for the same rows after a reorder, where order[i] is the old position of the new row i
+        new_positions = np.empty(len(order), dtype=np.int64)
+        new_positions[np.asarray(order)] = np.arange(len(order))
+        return RosterIndex({key: int(new_positions[p]) for key, p in self.positions.items()}, self.size,
+                           {key: [int(new_positions[p]) for p in ps] for key, ps in self.extra_positions.items()})
+
+
+def match_assignment_scores(roster_index, assignment_df):
+    # find the username column of the assignment file (case-insensitive)
+    username_col = next((c for c in assignment_df.columns if str(c).upper() == 'USERNAME'), None)
+    if username_col is None:
+        raise ValueError("Could not find a column named 'Username' in the assignment file.")
+
+    assignment_usernames = assignment_df[username_col]
+    assignment_keys = normalize_usernames(assignment_usernames)
+    assignment_scores = assignment_df['Score']
+    positions = roster_index.lookup(assignment_keys)
+
+    # when a username shows up more than once the last score wins
+    duplicated = (assignment_keys.duplicated(keep=False) & assignment_keys.notna()).to_numpy()
+    keep = (~assignment_keys.duplicated(keep='last')).to_numpy() & (positions >= 0)
+
+    # look up every assignment username in the roster index and place its score on that row
+    scores = np.full(roster_index.size, np.nan,
+                     dtype=float if pd.api.types.is_numeric_dtype(assignment_scores) else object)
+    scores[positions[keep]] = assignment_scores.to_numpy()[keep]
+    for key, score in zip(assignment_keys.to_numpy(dtype=object, na_value=None)[keep], scores[positions[keep]]):
+        for position in roster_index.extra_positions.get(key, ()):
+            scores[position] = score
+
+    # usernames in the assignment that have no row in the gradebook
+    unmatched = (positions < 0) & assignment_keys.notna().to_numpy()
+
+    report = {
+        'unmatched': assignment_usernames[unmatched].astype(str).tolist(),
+        'duplicates': sorted(set(assignment_usernames[duplicated].astype(str))),
+    }
+    return scores, report
+
+
+def drop_lowest_scores(scores, n=1):
+    # scores is a 2-D float array with one row per student and NaN for missing grades
+    if n < 1:
+        raise ValueError("The number of grades to drop must be at least 1.")
+    scores = np.array(scores, dtype=float)
+    if scores.size == 0:
+        return scores
+
+    graded = ~np.isnan(scores)
+    grade_count = graded.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_grade = np.ceil(np.nansum(scores, axis=1) / grade_count)
+
+    # the n-th lowest grade of each row is the cut-off; NaN sorts last so it never becomes the cut-off
+    # unless the row has no grades at all. Every grade at or below the cut-off is replaced, so ties
+    # with the lowest grade are all dropped
+    nth_lowest = np.minimum(n, grade_count) - 1
+    cutoff = np.sort(scores, axis=1)[np.arange(scores.shape[0]), np.maximum(nth_lowest, 0)]
+    with np.errstate(invalid='ignore'):
+        to_replace = graded & (scores <= cutoff[:, np.newaxis])
+
+    return np.where(to_replace, average_grade[:, np.newaxis], scores)
+
+
+# curve strategies: each takes the 2-D float score array and the per-column maximum to curve against
+CURVE_STRATEGIES = {
+    # add the same points to every score so the highest one becomes 100
+    'shift_to_max': lambda scores, max_scores: scores + (100 - max_scores),
+    # multiply every score so the highest one becomes 100
+    'scale_to_max': lambda scores, max_scores: scores * (100 / max_scores),
+    # 10 * sqrt(score): low scores gain the most and 100 stays 100
+    'sqrt': lambda scores, max_scores: 10 * np.sqrt(np.clip(scores, 0, None)),
+    # bring extra credit above 100 back down to 100
+    'cap': lambda scores, max_scores: np.minimum(scores, 100),
+}
+
+
+def curve_scores(scores, strategy='shift_to_max', max_scores=None, cap=False):
+    # scores is a 2-D float array with one column per assignment and NaN for missing grades.
+    # max_scores defaults to the highest score of each column; pass pooled maximums to curve
+    # several sections against the same top score (NaN entries fall back to the column's own
+    # maximum). cap=True limits the curved scores to 100
+    if strategy not in CURVE_STRATEGIES:
+        raise ValueError(f"Unknown curve strategy '{strategy}'. Choose from: {', '.join(CURVE_STRATEGIES)}")
+    scores = np.array(scores, dtype=float)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # columns without any score have a NaN maximum
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        own_max = np.nanmax(scores, axis=0) if len(scores) else np.full(scores.shape[1], np.nan)
+        if max_scores is None:
+            max_scores = own_max
+        max_scores = np.broadcast_to(np.asarray(max_scores, dtype=float), own_max.shape)
+        max_scores = np.where(np.isnan(max_scores), own_max, max_scores)
+        curved = CURVE_STRATEGIES[strategy](scores, max_scores)
+
+    # a column without a usable maximum (no scores at all, or 0 and below when scaling) keeps its
+    # grades, so real zeros are never turned into missing grades
+    unusable = ~np.isfinite(max_scores)
+    if strategy == 'scale_to_max':
+        unusable |= max_scores <= 0
+    curved[:, unusable] = scores[:, unusable]
+    if cap:
+        curved = np.minimum(curved, 100)
+    return curved
+
+
+# number of raw rows parsed at a time when streaming a raw export
+EXPORT_CHUNKSIZE = 100_000
+
+
+class _HashingReader:
+    # file wrapper that feeds every byte read from the raw export to a hashlib object, when given one
+    def __init__(self, source, hasher=None):
+        self.source = source
+        self.hasher = hasher
+
+    def _consume(self, data):
+        if self.hasher is not None:
+            self.hasher.update(data)
+        return data
+
+    def read(self, size=-1):
+        return self._consume(self.source.read(size))
+
+    def readline(self, size=-1):
+        return self._consume(self.source.readline(size))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+
+class ExportFormat:
+    # a kind of raw export, recognized by its header line. Subclasses set the headers that can hold
+    # the username and the score (case-insensitive, the first one found is used), headers that must
+    # be present, and how the score column is turned into points out of 100
+    name = None
+    username_headers = ()
+    score_headers = ()
+    required_headers = ()
+    score_dtype = float
+
+    def match(self, headers):
+        # (username column, score column) of this format in the header, or None if it is another format
+        headers = [h.strip().upper() for h in headers]
+        if any(h.upper() not in headers for h in self.required_headers):
+            return None
+        username_col_index = next((headers.index(h.upper()) for h in self.username_headers if h.upper() in headers),
+                                  None)
+        score_col_index = next((headers.index(h.upper()) for h in self.score_headers if h.upper() in headers), None)
+        if username_col_index is None or score_col_index is None:
+            return None
+        return username_col_index, score_col_index
+
+    def parse_scores(self, scores):
+        return scores
+
+
+class EdpuzzleExport(ExportFormat):
+    name = 'edpuzzle'
+    username_headers = ('Username',)
+    score_headers = ('Grade (out of 100)',)
+
+
+class CanvasExport(ExportFormat):
+    # Canvas gradebook export. Its "Points Possible" row has no login and text in the score
+    # columns, so it is dropped like any other row without a score
+    name = 'canvas'
+    username_headers = ('SIS Login ID', 'Login ID')
+    score_headers = ('Current Score', 'Final Score')
+    required_headers = ('Student',)
+    score_dtype = str
+
+    def parse_scores(self, scores):
+        return pd.to_numeric(scores, errors='coerce')
+
+
+class GoogleFormsExport(ExportFormat):
+    # Google Forms quiz responses, where the score is text like "7 / 10". Other files with a
+    # Timestamp column are detected as well, so plain scores out of 100 are kept as they are
+    name = 'google_forms'
+    username_headers = ('Username', 'Email Address')
+    score_headers = ('Score',)
+    required_headers = ('Timestamp',)
+    score_dtype = str
+
+    def parse_scores(self, scores):
+        fraction = scores.str.extract(r'^\s*([\d.]+)\s*/\s*([\d.]+)\s*$')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            points = pd.to_numeric(fraction[0], errors='coerce') / pd.to_numeric(fraction[1], errors='coerce') * 100
+        return points.where(fraction[0].notna(), pd.to_numeric(scores, errors='coerce'))
+
+
+class ScoresExport(ExportFormat):
+    # any CSV with a username column and a score column that is already out of 100
+    name = 'scores'
+    username_headers = ('Username', 'Email')
+    score_headers = ('Score', 'Grade')
+
+
+# formats tried in this order when detecting the format of a raw export
+EXPORT_FORMATS = {
+    'edpuzzle': EdpuzzleExport,
+    'canvas': CanvasExport,
+    'google_forms': GoogleFormsExport,
+    'scores': ScoresExport,
+}
+
+
+def get_export_format(export_format):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}', expected one of: {', '.join(EXPORT_FORMATS)}.")
+    return EXPORT_FORMATS[export_format]()
+
+
+def register_export_format(format_class):
+    # add an ExportFormat subclass. It is tried before the generic 'scores' format, which matches
+    # almost any file with a username and a score
+    formats = {name: cls for name, cls in EXPORT_FORMATS.items() if name != format_class.name}
+    generic = formats.pop('scores', None)
+    EXPORT_FORMATS.clear()
+    EXPORT_FORMATS.update(formats)
+    EXPORT_FORMATS[format_class.name] = format_class
+    if generic is not None:
+        EXPORT_FORMATS['scores'] = generic
+    detect_export_format.cache_clear()
+
+
+@functools.lru_cache(maxsize=256)
+def detect_export_format(headers):
+    # (format name, username column, score column) for a header tuple. Exports of one source share
+    # their header, so detection runs once per header signature
+    for name, format_class in EXPORT_FORMATS.items():
+        columns = format_class().match(headers)
+        if columns is not None:
+            return (name,) + columns
+    raise ValueError(f"Could not recognize the raw data file: none of the formats {', '.join(EXPORT_FORMATS)} "
+                     f"has its username and score columns in the header.")
+
+
+def read_export_scores(raw_data_path, chunksize=EXPORT_CHUNKSIZE, hasher=None, export_format=None):
+    # yield DataFrames with 'Username' and 'Score' columns, dropping rows where either is missing.
+    # The format is detected from the header line unless export_format names it
+    with open(raw_data_path, mode='rb') as raw_file:
+        source = _HashingReader(raw_file, hasher)
+
+        headers = next(csv.reader([source.readline().decode('utf-8-sig')]), [])
+        if export_format is None:
+            export_format, username_col_index, score_col_index = detect_export_format(tuple(headers))
+        else:
+            columns = get_export_format(export_format).match(headers)
+            if columns is None:
+                raise ValueError(f"Could not find the username and score columns of the '{export_format}' format "
+                                 f"in the raw data file.")
+            username_col_index, score_col_index = columns
+        export = get_export_format(export_format)
+
+        # parse only the two projected columns of the remaining rows
+        reader = pd.read_csv(source, header=None, names=range(len(headers)),
+                             usecols=[username_col_index, score_col_index],
+                             dtype={username_col_index: str, score_col_index: export.score_dtype},
+                             chunksize=chunksize)
+        with reader:
+            for chunk in reader:
+                chunk = pd.DataFrame({'Username': chunk[username_col_index],
+                                      'Score': export.parse_scores(chunk[score_col_index]).astype(float)})
+                yield chunk.dropna()
+
+
+def parse_export(raw_data_path):
+    # the scores of a whole raw export (of any detected format), their case-insensitive username
+    # keys and the file's SHA-256
+    hasher = hashlib.sha256()
+    with stage('parse_export', assignment=os.path.basename(raw_data_path)) as record:
+        scores_df = concat_score_chunks(read_export_scores(raw_data_path, hasher=hasher))
+        score_keys = normalize_usernames(scores_df['Username'])
+        record.update(rows=len(scores_df), bytes_read=os.path.getsize(raw_data_path))
+    return scores_df, score_keys, hasher.hexdigest()
+
+
+def file_sha256(path):
+    # content hash of a file, read in blocks
+    hasher = hashlib.sha256()
+    with open(path, mode='rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+# ioctl that makes a file share the data blocks of another (copy-on-write) on btrfs, XFS and similar
+FICLONE = 0x40049409
+
+# folder of content-addressed copies of raw exports, named by their SHA-256. It is shared by the
+# periods of a grade year, so an export imported into several periods is stored once
+RAW_EXPORT_STORE = ".raw_exports"
+
+# folders whose files are written once and never changed, so copies of them can be hardlinks
+IMMUTABLE_FOLDERS = ("original_data", RAW_EXPORT_STORE)
+
+
+def fast_copy_file(src, dst):
+    # copy without moving the data through Python: a reflink where the file system supports it,
+    # otherwise copy_file_range inside the kernel, otherwise shutil.copyfile (which uses sendfile
+    # or fcopyfile where it can)
+    if fcntl is not None and sys.platform.startswith('linux'):
+        with open(src, mode='rb') as src_file, open(dst, mode='wb') as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+                return dst
+            except OSError:
+                pass
+            if hasattr(os, 'copy_file_range'):
+                try:
+                    remaining = os.fstat(src_file.fileno()).st_size
+                    while remaining > 0:
+                        copied = os.copy_file_range(src_file.fileno(), dst_file.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                    if remaining == 0:
+                        return dst
+                except OSError:
+                    pass
+    shutil.copyfile(src, dst)
+    return dst
+
+
+def link_or_copy_file(src, dst):
+    # hardlink src at dst, or copy it when the two are on different file systems (or links are unsupported)
+    try:
+        os.link(src, dst)
+    except OSError:
+        fast_copy_file(src, dst)
+    return dst
+
+
+def _copy_tree_file(src, dst):
+    # copy function for shutil.copytree: files of immutable folders are hardlinked, the rest
+    # (gradebooks and graded assignments, which are rewritten in place) get their own copy
+    if os.path.basename(os.path.dirname(src)) in IMMUTABLE_FOLDERS:
+        return link_or_copy_file(src, dst)
+    return fast_copy_file(src, dst)
+
+
+def copy_tree(src, dst):
+    # copy a period or grade year folder; the archived raw exports cost no time or disk space
+    return shutil.copytree(src, dst, copy_function=_copy_tree_file)
+
+
+def archive_raw_export(raw_data_path, archive_path, store_path, sha256):
+    # store the raw export once under its hash and hardlink it as archive_path. Returns the number of
+    # bytes that had to be copied, which is 0 when an identical export was archived before
+    os.makedirs(store_path, exist_ok=True)
+    stored_path = os.path.join(store_path, f"{sha256}.csv")
+    copied = 0
+    if not os.path.exists(stored_path):
+        temp_path = f"{stored_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fast_copy_file(raw_data_path, temp_path)
+        os.replace(temp_path, stored_path)
+        copied = os.path.getsize(stored_path)
+    if os.path.exists(archive_path) and os.path.samefile(stored_path, archive_path):
+        return copied
+
+    # link under a temporary name and rename over the old archive, so an archive linked to the
+    # store is replaced and never written through
+    temp_path = f"{archive_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    link_or_copy_file(stored_path, temp_path)
+    os.replace(temp_path, archive_path)
+    return copied
+
+
+def concat_score_chunks(chunks):
+    # collect streamed score chunks into a single DataFrame
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame({'Username': pd.Series(dtype=str), 'Score': pd.Series(dtype=float)})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def gradebook_with_float_scores(df):
+    # USERNAME as text and every assignment column as float64, with missing scores as NaN
+    typed = pd.DataFrame({'USERNAME': df['USERNAME'].astype(object)}, index=df.index)
+    for col in df.columns:
+        if col != 'USERNAME':
+            typed[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+    return typed
+
+
+def fsync_file(path):
+    # make sure a file written through a library is on disk before it replaces another one
+    with open(path, mode='rb+') as written_file:
+        os.fsync(written_file.fileno())
+
+
+class GradebookStorage:
+    # how a Period keeps its gradebook on disk; subclasses set file_name and implement load/save
+    file_name = None
+
+    def load(self, path):
+        raise NotImplementedError
+
+    def save(self, df, path):
+        raise NotImplementedError
+
+    def stat(self, path):
+        # (mtime, size) of the stored gradebook, used to tell when the in-memory copy is stale
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def replace(self, temp_path, path):
+        # move a gradebook saved to temp_path over the one at path, once it is on disk
+        fsync_file(temp_path)
+        os.replace(temp_path, path)
+
+
+class CsvGradebookStorage(GradebookStorage):
+    # plain text gradebook, also the format used for imports and exports
+    file_name = "gradebook.csv"
+
+    def load(self, path):
+        return pd.read_csv(path)
+
+    def save(self, df, path):
+        df.to_csv(path, index=False)
+
+
+class FeatherGradebookStorage(GradebookStorage):
+    # Arrow IPC file with typed float score columns (needs pyarrow)
+    file_name = "gradebook.feather"
+
+    def __init__(self):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError("The 'feather' gradebook storage requires pyarrow: pip install pyarrow")
+
+    def load(self, path):
+        return pd.read_feather(path)
+
+    def save(self, df, path):
+        gradebook_with_float_scores(df).reset_index(drop=True).to_feather(path)
+
+
+class NumpyGradebookStorage(GradebookStorage):
+    # float64 score matrix, read back in a single binary read, next to a JSON index of usernames and
+    # assignment names
+    file_name = "gradebook_scores.npy"
+    index_file_name = "gradebook_index.json"
+
+    def _index_path(self, path):
+        # the index that goes with the score matrix at path, with the same suffix for temporary files
+        suffix = os.path.basename(path)[len(self.file_name):]
+        return os.path.join(os.path.dirname(path), self.index_file_name + suffix)
+
+    def load(self, path):
+        with open(self._index_path(path), mode='r') as index_file:
+            index = json.load(index_file)
+        scores = np.load(path)
+        if scores.shape != (len(index['usernames']), len(index['columns'])):
+            raise ValueError(f"The gradebook index does not match the score matrix in '{path}'.")
+        df = pd.DataFrame(scores, columns=index['columns'], copy=False)
+        df.insert(0, 'USERNAME', pd.Series(index['usernames'], dtype=object))
+        return df
+
+    def save(self, df, path):
+        typed = gradebook_with_float_scores(df)
+        columns = [col for col in typed.columns if col != 'USERNAME']
+        with open(self._index_path(path), mode='w') as index_file:
+            json.dump({'usernames': typed['USERNAME'].tolist(), 'columns': columns}, index_file)
+        with open(path, mode='wb') as scores_file:
+            np.save(scores_file, typed[columns].to_numpy(dtype=float).reshape(len(typed), len(columns)))
+
+    def replace(self, temp_path, path):
+        # both files are saved completely before either one is replaced. The score matrix goes last,
+        # so its mtime and size also cover the index
+        super().replace(self._index_path(temp_path), self._index_path(path))
+        super().replace(temp_path, path)
+
+
+GRADEBOOK_STORAGES = {
+    'csv': CsvGradebookStorage,
+    'feather': FeatherGradebookStorage,
+    'numpy': NumpyGradebookStorage,
+}
+
+
+def get_gradebook_storage(storage):
+    if storage not in GRADEBOOK_STORAGES:
+        raise ValueError(f"Unknown gradebook storage '{storage}', expected one of: {', '.join(GRADEBOOK_STORAGES)}.")
+    return GRADEBOOK_STORAGES[storage]()
+
+
+# number of journal entries after which a journaled Period folds its journal into the base gradebook
+JOURNAL_COMPACT_EVERY = 100
+
+
+def _json_values(values):
+    # plain Python values for a journal entry, with None for missing scores
+    return [None if pd.isna(value) else (value.item() if hasattr(value, 'item') else value) for value in values]
+
+
+def _column_values(values):
+    # journal values back to a column: float when every value is numeric, otherwise object
+    try:
+        return np.array([np.nan if value is None else value for value in values], dtype=float)
+    except (TypeError, ValueError):
+        return np.array(values, dtype=object)
+
+
+def score_change_entry(op, old_df, new_df, columns, new_columns=()):
+    # journal entry with only the cells of `columns` that differ between old_df and new_df,
+    # which must have the same rows in the same order
+    usernames = new_df['USERNAME'].to_numpy(dtype=object)
+    changes = {}
+    for column in columns:
+        new_values = new_df[column].to_numpy()
+        if column in new_columns:
+            changed = ~pd.isna(new_values)
+            changes[column] = {'usernames': _json_values(usernames[changed]),
+                               'new': _json_values(new_values[changed])}
+            continue
+        old_values = old_df[column].to_numpy()
+        with np.errstate(invalid='ignore'):
+            changed = ~((old_values == new_values) | (pd.isna(old_values) & pd.isna(new_values)))
+        if changed.any():
+            changes[column] = {'usernames': _json_values(usernames[changed]),
+                               'new': _json_values(new_values[changed]),
+                               'old': _json_values(old_values[changed])}
+    return {'op': op, 'new_columns': list(new_columns), 'changes': changes}
+
+
+def adjustment_entry(op, **fields):
+    # a curve, dropped grades or re-imported columns, kept with the journal entry of the change for
+    # the student reports; the id lets undo find it again
+    return dict({'id': uuid.uuid4().hex, 'op': op}, **fields, time=time.time())
+
+
+def _set_scores_by_username(df, column, usernames, values):
+    lookup = pd.Series(_column_values(values), index=pd.Index(usernames, dtype=object))
+    lookup = lookup[~lookup.index.duplicated(keep='last')]
+    rows = df['USERNAME'].isin(lookup.index).to_numpy()
+    if rows.any():
+        column_values = df[column].to_numpy(dtype=object if lookup.dtype == object else float, copy=True)
+        column_values[rows] = df['USERNAME'][rows].map(lookup).to_numpy()
+        df[column] = column_values
+
+
+def apply_journal_entry(df, entry, entries_by_seq):
+    # redo one journaled operation on df; applying an entry twice gives the same gradebook
+    if entry['op'] == 'undo':
+        return revert_journal_entry(df, entries_by_seq[entry['target']])
+    if entry['op'] == 'add_usernames':
+        known = set(df['USERNAME'])
+        new_usernames = [username for username in entry['usernames'] if username not in known]
+        return pd.concat([df, pd.DataFrame({'USERNAME': new_usernames})], ignore_index=True, sort=False)
+    if entry['op'] == 'sort':
+        return df
+
+    for column in entry.get('new_columns', []):
+        if column not in df.columns:
+            df[column] = np.nan
+    for column, change in entry.get('changes', {}).items():
+        _set_scores_by_username(df, column, change['usernames'], change['new'])
+    return df
+
+
+def revert_journal_entry(df, entry):
+    # undo one journaled operation on df
+    if entry['op'] == 'add_usernames':
+        return df[~df['USERNAME'].isin(entry['usernames'])].reset_index(drop=True)
+    for column, change in entry.get('changes', {}).items():
+        if column not in entry.get('new_columns', []):
+            _set_scores_by_username(df, column, change['usernames'], change['old'])
+    return df.drop(columns=[column for column in entry.get('new_columns', []) if column in df.columns])
+
+
+def replay_journal_entries(df, entries):
+    # apply journal entries in order on top of the base gradebook, which keeps its rows sorted by 'USERNAME'
+    entries_by_seq = {entry['seq']: entry for entry in entries}
+    for entry in entries:
+        df = apply_journal_entry(df, entry, entries_by_seq)
+    if not df['USERNAME'].is_monotonic_increasing:
+        df = df.sort_values(by=['USERNAME'], ascending=True, kind='stable').reset_index(drop=True)
+    return df
+
+
+# percentiles reported for every assignment by the analytics methods
+ANALYTICS_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def summarize_assignment_scores(assignment_names, scores):
+    # count, missing, mean, spread and percentiles of every column of a 2-D float score array
+    scores = np.asarray(scores, dtype=float).reshape(len(scores), len(assignment_names))
+    graded = ~np.isnan(scores)
+    with warnings.catch_warnings():
+        # assignments nobody has a score for yet give NaN statistics
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        summary = pd.DataFrame({
+            'assignment': list(assignment_names),
+            'count': graded.sum(axis=0),
+            'missing': (~graded).sum(axis=0),
+            'mean': np.nanmean(scores, axis=0) if len(scores) else np.nan,
+            'std': np.nanstd(scores, axis=0) if len(scores) else np.nan,
+            'min': np.nanmin(scores, axis=0) if len(scores) else np.nan,
+            'max': np.nanmax(scores, axis=0) if len(scores) else np.nan,
+        })
+        summary.insert(4, 'median', np.nanmedian(scores, axis=0) if len(scores) else np.nan)
+        percentiles = np.nanpercentile(scores, ANALYTICS_PERCENTILES, axis=0) if len(scores) else \
+            np.full((len(ANALYTICS_PERCENTILES), len(assignment_names)), np.nan)
+    for q, values in zip(ANALYTICS_PERCENTILES, percentiles.reshape(len(ANALYTICS_PERCENTILES), -1)):
+        summary[f'p{q}'] = values
+    return summary
+
+
+# percentiles 0, 1, ..., 100 kept per assignment in the period summaries, so assignments can be
+# pooled across periods without reading the gradebooks again
+SKETCH_PERCENTILES = np.linspace(0, 100, 101)
+
+
+def score_sketches(scores):
+    # (assignments x 101) array of the 0th to 100th percentile of every column
+    scores = np.asarray(scores, dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        if not len(scores):
+            return np.full((scores.shape[1], len(SKETCH_PERCENTILES)), np.nan)
+        return np.nanpercentile(scores, SKETCH_PERCENTILES, axis=0).T.reshape(scores.shape[1], -1)
+
+
+def pool_assignment_summaries(assignment_name, rows, sketches):
+    # statistics of one assignment over several periods from their summary rows and sketches.
+    # Count, missing, mean, std, min and max are exact; percentiles are read off the count-weighted
+    # mix of the per-period percentile curves
+    counts = np.array([row['count'] for row in rows], dtype=float)
+    total = counts.sum()
+    pooled = {'assignment': assignment_name, 'count': int(total), 'missing': int(sum(row['missing'] for row in rows))}
+    graded = counts > 0
+    if not total:
+        pooled.update({key: np.nan for key in ('mean', 'median', 'std', 'min', 'max')})
+        pooled.update({f'p{q}': np.nan for q in ANALYTICS_PERCENTILES})
+        return pooled
+
+    means = np.array([row['mean'] for row in rows], dtype=float)[graded]
+    stds = np.array([row['std'] for row in rows], dtype=float)[graded]
+    weights = counts[graded]
+    mean = np.sum(weights * means) / total
+    pooled['mean'] = mean
+    pooled['std'] = np.sqrt(max(np.sum(weights * (stds ** 2 + means ** 2)) / total - mean ** 2, 0))
+    pooled['min'] = min(row['min'] for row, g in zip(rows, graded) if g)
+    pooled['max'] = max(row['max'] for row, g in zip(rows, graded) if g)
+
+    sketches = [np.asarray(sketch, dtype=float) for sketch, g in zip(sketches, graded) if g]
+    grid = np.unique(np.concatenate(sketches))
+    cdf = sum(w * np.interp(grid, sketch, SKETCH_PERCENTILES / 100, left=0, right=1)
+              for w, sketch in zip(weights, sketches)) / total
+    pooled['median'] = float(np.interp(0.5, cdf, grid))
+    for q in ANALYTICS_PERCENTILES:
+        pooled[f'p{q}'] = float(np.interp(q / 100, cdf, grid))
+    return pooled
+
+
+def summarize_student_scores(usernames, scores):
+    # average, number of graded and missing assignments for every row of a 2-D float score array
+    scores = np.asarray(scores, dtype=float).reshape(len(usernames), -1) if len(usernames) else np.empty((0, 0))
+    graded = ~np.isnan(scores)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        average = np.nanmean(scores, axis=1) if scores.shape[1] else np.full(len(usernames), np.nan)
+    return pd.DataFrame({'USERNAME': list(usernames), 'average': average,
+                         'graded': graded.sum(axis=1), 'missing': (~graded).sum(axis=1)})
+
+
+def _write_analytics(df, csv_path):
+    if csv_path is not None:
+        df.to_csv(csv_path, index=False)
+    return df
+
+
+def compare_gradeyears(gradeyears, pooled=True, csv_path=None):
+    # assignment statistics of several grade years side by side, one block of rows per year
+    frames = []
+    for gradeyear in gradeyears:
+        summary = gradeyear.assignment_summary(pooled=pooled)
+        summary.insert(0, 'year', gradeyear.get_name())
+        frames.append(summary)
+    return _write_analytics(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(), csv_path)
+
+
+# students rendered by one task of the report process pool
+STUDENT_REPORTS_PER_TASK = 200
+
+
+def _format_score(score):
+    return "" if score is None or np.isnan(score) else f"{score:g}"
+
+
+def _student_report_notes(item):
+    notes = []
+    if item['curve']:
+        notes.append(f"curved ({item['curve']})")
+    if item['dropped'] is not None:
+        notes.append(f"dropped (was {_format_score(item['dropped'])})")
+    return "; ".join(notes)
+
+
+def render_student_csv(record):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['assignment', 'score', 'note'])
+    for item in record['assignments']:
+        writer.writerow([item['assignment'], _format_score(item['score']), _student_report_notes(item)])
+    writer.writerow(['average', _format_score(record['average']),
+                     f"{record['graded']} graded, {record['missing']} missing"])
+    return output.getvalue()
+
+
+def render_student_html(record):
+    rows = "".join(f"<tr><td>{html.escape(str(item['assignment']))}</td><td>{_format_score(item['score'])}</td>"
+                   f"<td>{html.escape(_student_report_notes(item))}</td></tr>\n" for item in record['assignments'])
+    title = html.escape(f"{record['username']} - Period {record['period']}")
+    return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title></head><body>\n"
+            f"<h1>{title}</h1>\n<table>\n<tr><th>Assignment</th><th>Score</th><th>Note</th></tr>\n{rows}"
+            f"<tr><th>Average</th><th>{_format_score(record['average'])}</th>"
+            f"<th>{record['graded']} graded, {record['missing']} missing</th></tr>\n</table>\n</body></html>\n")
+
+
+# report format -> (file extension, renderer)
+STUDENT_REPORT_FORMATS = {
+    'csv': ('csv', render_student_csv),
+    'html': ('html', render_student_html),
+}
+
+
+def safe_file_name(value):
+    # a file name safe on every file system that no other value maps to: values that had to be
+    # changed, or that differ from another only in case, get a suffix from a hash of the value.
+    # '~' is never left in a changed name, so a suffixed name cannot equal an unchanged one
+    value = str(value)
+    name = re.sub(r'[^\w.@-]', '_', value)
+    if name != value.lower():
+        name = f"{name}~{hashlib.sha256(value.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+def student_report_name(record, report_format):
+    # period folder and file name of the report of a student
+    extension = STUDENT_REPORT_FORMATS[report_format][0]
+    return f"{safe_file_name(record['period'])}/{safe_file_name(record['username'])}.{extension}"
+
+
+def _render_student_reports(task):
+    # runs in a worker process: write the reports of a batch of students, or return them for the archive
+    records, report_format, output_path, archive = task
+    render = STUDENT_REPORT_FORMATS[report_format][1]
+    rendered = [(student_report_name(record, report_format), render(record)) for record in records]
+    if archive:
+        return rendered
+    for name, content in rendered:
+        report_path = os.path.join(output_path, *name.split('/'))
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        with open(report_path, mode='w', encoding='utf-8', newline='') as report_file:
+            report_file.write(content)
+    return [(name, None) for name, _ in rendered]
+
+
+def map_in_processes(func, items, max_workers=None):
+    # yield func(item) in order from a process pool, with only a few items queued at a time so
+    # memory stays bounded however many items there are
+    max_workers = max_workers or os.cpu_count() or 1
+    pending = collections.deque()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# file in a grade year folder that lists its periods
+GRADEYEAR_METADATA_FILE = "gradeyear.json"
+# file in a period folder with the storage and journal settings of its gradebook
+PERIOD_METADATA_FILE = "period.json"
+
+
+def read_period_settings(period_path):
+    # storage and journal settings of an existing period folder from its period.json, or None when
+    # the folder has no gradebook yet
+    metadata_path = os.path.join(period_path, PERIOD_METADATA_FILE)
+    if os.path.exists(metadata_path):
+        with open(metadata_path, mode='r') as metadata_file:
+            return json.load(metadata_file)
+
+    # folders from before period.json are recognized by their gradebook file. gradebook.csv may
+    # only be an export of a gradebook stored in another format, so it is checked last
+    for storage_name, storage in sorted(GRADEBOOK_STORAGES.items(), key=lambda item: item[0] == 'csv'):
+        if os.path.exists(os.path.join(period_path, storage.file_name)):
+            return {'storage': storage_name,
+                    'journal': os.path.exists(os.path.join(period_path, "gradebook.journal"))}
+    return None
+
+
+def discover_periods(gradeyear_path):
+    # settings of the period folders in a grade year folder
+    periods = []
+    for entry in sorted(os.scandir(gradeyear_path), key=lambda entry: entry.name):
+        if entry.is_dir():
+            settings = read_period_settings(entry.path)
+            if settings is not None:
+                periods.append(dict({'name': entry.name}, **settings))
+    return periods
 
 
 class GradeYear:
@@ -14,30 +1061,78 @@ class GradeYear:
             self.path = os.path.join(gradeyear_location, self.year)
 
         self.periods = []
+        # name -> settings of periods found by GradeYear.open that were not used yet
+        self._unopened_periods = {}
         if periods is not None:
             for period in periods:
                 self.add_period_to_folder(period)
 
+    @classmethod
+    def open(cls, gradeyear_path):
+        # reopen an existing grade year folder without reading any gradebook; periods are listed in
+        # gradeyear.json (or found by looking for gradebook files) and only opened when first used
+        gradeyear_path = os.path.abspath(gradeyear_path)
+        if not os.path.isdir(gradeyear_path):
+            raise ValueError(f"Could not find the grade year folder '{gradeyear_path}'.")
+        metadata_path = os.path.join(gradeyear_path, GRADEYEAR_METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, mode='r') as metadata_file:
+                metadata = json.load(metadata_file)
+        else:
+            metadata = {'year': os.path.basename(gradeyear_path), 'periods': discover_periods(gradeyear_path)}
+
+        gradeyear = cls(metadata['year'], gradeyear_location=os.path.dirname(gradeyear_path))
+        gradeyear.path = gradeyear_path
+        for period_settings in metadata['periods']:
+            gradeyear._unopened_periods[period_settings['name']] = period_settings
+        return gradeyear
+
     def get_name(self):
         return self.year
 
+    def get_period_names(self):
+        return [period.get_name() for period in self.periods] + list(self._unopened_periods)
+
+    def _open_period(self, name_of_period):
+        settings = self._unopened_periods.pop(name_of_period)
+        period = Period(settings['name'], path=os.path.join(self.path, settings['name']),
+                        storage=settings.get('storage'), journal=settings.get('journal'))
+        self.periods.append(period)
+        return period
+
     def get_period(self, name_of_period):
-        if len(self.periods) == 0:
-            return None
-        else:
-            for period in self.periods:
-                if period.get_name() == name_of_period:
-                    return period
+        for period in self.periods:
+            if period.get_name() == name_of_period:
+                return period
+        if name_of_period in self._unopened_periods:
+            return self._open_period(name_of_period)
         return None
 
+    def get_periods(self):
+        # every period of the grade year, opening the ones that were not used yet
+        for name_of_period in list(self._unopened_periods):
+            self._open_period(name_of_period)
+        return self.periods
+
     def print_periods(self):
-        if not self.periods:
+        period_names = self.get_period_names()
+        if not period_names:
             print("No periods found.")
             return
 
         print("Periods:")
-        for i, period in enumerate(self.periods, start=1):
-            print(f"{i}. {period.get_name()}")
+        for i, period_name in enumerate(period_names, start=1):
+            print(f"{i}. {period_name}")
+
+    def save_metadata(self):
+        # list the periods in gradeyear.json so GradeYear.open does not have to look for them
+        periods = [{'name': period.get_name(), 'storage': period.storage_name, 'journal': period.journal}
+                   for period in self.periods]
+        periods.extend(self._unopened_periods.values())
+        metadata_path = os.path.join(self.path, GRADEYEAR_METADATA_FILE)
+        with open(f"{metadata_path}.tmp", mode='w') as metadata_file:
+            json.dump({'year': self.year, 'periods': periods}, metadata_file, indent=2)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
 
     def create_folder_on_desktop(self):
         desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
@@ -47,6 +1142,17 @@ class GradeYear:
     def add_period_to_folder(self, period):
         self.periods.append(period)
         self.move_period_to_gradeyear(period)
+        self.save_metadata()
+
+    def create_period(self, name, storage=None, journal=None):
+        # create a period directly inside the grade year folder, or reopen it if it is already there
+        period = self.get_period(name)
+        if period is None:
+            os.makedirs(self.path, exist_ok=True)
+            period = Period(name, path=os.path.join(self.path, name), storage=storage, journal=journal)
+            self.periods.append(period)
+            self.save_metadata()
+        return period
 
     def move_period_to_gradeyear(self, period):
         new_location = os.path.join(self.path, period.name)
@@ -59,30 +1165,159 @@ class GradeYear:
         if os.path.exists(new_location) and new_location != period.path:
             raise ValueError("Destination folder already exists.")
 
-        # Move the period to the new location
-        shutil.move(period.path, new_location)
-
-        # Update the period's path to the new location
-        period.path = new_location
-
-        # Update the paths of self.original_data and self.graded_folder
-        period.original_data_folder_path = os.path.join(period.path, "original_data")
-        period.graded_folder_path = os.path.join(period.path, "Graded Assignments")
-
-    def bulk_import_edpuzzle_assignment(self, csv_path):
-        # Iterate through each period and import performance data for the respective usernames
+        # Move the period to the new location; a rename on the same file system, otherwise a
+        # kernel-side copy of every file
+        period.flush_gradebook()
+        shutil.move(period.path, new_location, copy_function=fast_copy_file)
+
+        # Update the period's path (and the paths of its folders and files) to the new location
+        period.set_path(new_location)
+
+    def curve(self, assignment_names=None, strategy='shift_to_max', pooled=False, cap=False, max_workers=None):
+        # curve assignments in every period with one gradebook load and save per period.
+        # assignment_names=None curves every assignment; a period without one of the assignments
+        # just skips it. With pooled=True all periods are curved against the highest score of any
+        # period (taken from the cached period summaries) instead of their own
+        periods = self.get_periods()
+        max_scores = None
+        if pooled:
+            frames = [period.get_summary()['assignments'][['assignment', 'max']] for period in periods]
+            if frames:
+                max_scores = pd.concat(frames).groupby('assignment')['max'].max().to_dict()
+
+        def curve_period(period):
+            columns = period.get_assignment_names()
+            if assignment_names is not None:
+                columns = [col for col in assignment_names if col in columns]
+            return period.curve(columns, strategy, max_scores, cap)
+
+        results = map_in_threads(curve_period, periods, max_workers)
+        return {period.get_name(): result for period, result in zip(periods, results)}
+
+    def copy_gradeyear_tree(self, new_location):
+        # copy the whole grade year folder to new_location and open the copy
         for period in self.periods:
-            period.edpuzzle_filtering(csv_path)
-            period.transfer_all_graded_to_gradebook()
+            period.flush_gradebook()
+        copy_tree(self.path, new_location)
+        return GradeYear.open(new_location)
+
+    def drop_lowest(self, n=1):
+        # drop the n lowest grades of every student in every period of the grade year
+        for period in self.get_periods():
+            period.drop_lowest(n)
+
+    def bulk_import_edpuzzle_assignment(self, csv_path, max_workers=None, min_overlap=0):
+        # periods that already imported this exact file are left alone
+        assignment_name = os.path.splitext(os.path.basename(csv_path))[0]
+        periods = [period for period in self.get_periods()
+                   if not period.is_import_unchanged(csv_path, assignment_name)]
+        if not periods:
+            return {}
+
+        # parse the universal assignment once for all periods
+        scores_df, score_keys, sha256 = parse_export(csv_path)
+
+        # give each period only the rows of its own roster and update the gradebooks concurrently;
+        # periods with fewer than min_overlap students in the file are skipped
+        def import_into_period(period):
+            return period.import_roster_scores(csv_path, scores_df, score_keys, sha256, min_overlap)
+
+        results = map_in_threads(import_into_period, periods, max_workers)
+
+        return {period.get_name(): result for period, result in zip(periods, results) if result is not None}
+
+    def assignment_summary(self, pooled=False, csv_path=None):
+        # per-assignment statistics of every period, or of all periods together when pooled is True
+        # (assignments with the same name in several periods are combined)
+        summaries = [(period.get_name(), period.get_summary()) for period in self.get_periods()]
+        if not pooled:
+            frames = []
+            for period_name, summary in summaries:
+                frame = summary['assignments'].copy()
+                frame.insert(0, 'period', period_name)
+                frames.append(frame)
+            result = pd.concat(frames, ignore_index=True) if frames else summarize_assignment_scores([], [])
+            return _write_analytics(result, csv_path)
+
+        # pool the cached statistics and percentile sketches of each assignment across periods
+        rows = {}
+        sketches = {}
+        for _, summary in summaries:
+            for row in summary['assignments'].to_dict(orient='records'):
+                rows.setdefault(row['assignment'], []).append(row)
+                sketches.setdefault(row['assignment'], []).append(summary['sketches'][row['assignment']])
+        columns = summarize_assignment_scores([], []).columns
+        result = pd.DataFrame([pool_assignment_summaries(name, rows[name], sketches[name]) for name in rows],
+                              columns=columns)
+        return _write_analytics(result, csv_path)
+
+    def student_averages(self, csv_path=None):
+        # average and graded/missing counts of every student in every period
+        frames = []
+        for period in self.get_periods():
+            frame = period.get_summary()['students'].copy()
+            frame.insert(0, 'period', period.get_name())
+            frames.append(frame)
+        result = pd.concat(frames, ignore_index=True) if frames else summarize_student_scores([], [])
+        return _write_analytics(result, csv_path)
+
+    def generate_student_reports(self, output_path, report_format='csv', archive=False, max_workers=None,
+                                 students_per_task=STUDENT_REPORTS_PER_TASK):
+        # one report per student of every period: files in a folder per period under output_path,
+        # or with archive=True a single zip file at output_path. Each gradebook is read once and
+        # the reports are rendered in a process pool; returns the number of reports
+        if report_format not in STUDENT_REPORT_FORMATS:
+            raise ValueError(f"Unknown report format '{report_format}', expected one of: "
+                             f"{', '.join(STUDENT_REPORT_FORMATS)}.")
+
+        def tasks():
+            for period in self.get_periods():
+                records = period.get_student_records()
+                for start in range(0, len(records), students_per_task):
+                    yield records[start:start + students_per_task], report_format, output_path, archive
+
+        count = 0
+        with contextlib.ExitStack() as stack:
+            archive_file = None
+            if archive:
+                archive_file = stack.enter_context(zipfile.ZipFile(output_path, mode='w',
+                                                                   compression=zipfile.ZIP_DEFLATED))
+            else:
+                os.makedirs(output_path, exist_ok=True)
+            for reports in map_in_processes(_render_student_reports, tasks(), max_workers):
+                if archive_file is not None:
+                    for name, content in reports:
+                        archive_file.writestr(name, content)
+                count += len(reports)
+        return count
 
 class Period:
-    def __init__(self, name, path=None):
+    def __init__(self, name, path=None, storage=None, journal=None):
         self.name = name
-
         if path is None:
-            self.path = os.path.join(os.path.expanduser("~"), "Downloads", self.name)
-        else:
-            self.path = path
+            path = os.path.join(os.path.expanduser("~"), "Downloads", self.name)
+
+        # an existing period keeps the storage and journal settings recorded in its period.json;
+        # storage and journal default to them, and other values are an error instead of a silent
+        # conversion. Settings guessed for a folder without period.json can be overridden
+        settings = read_period_settings(path) or {'storage': 'csv', 'journal': False}
+        recorded = os.path.exists(os.path.join(path, PERIOD_METADATA_FILE))
+        for setting, value in (('storage', storage), ('journal', journal)):
+            if value is None or value == settings[setting]:
+                continue
+            if recorded:
+                raise ValueError(f"Period '{name}' was created with {setting}={settings[setting]!r}, "
+                                 f"not {value!r}.")
+            settings[setting] = value
+        self.storage_name = settings['storage']
+        self.storage = get_gradebook_storage(self.storage_name)
+
+        # with journal=True changes are appended to gradebook.journal and folded into the
+        # gradebook every journal_compact_every entries, instead of rewriting it on every change
+        self.journal = settings['journal']
+        self.journal_compact_every = JOURNAL_COMPACT_EVERY
+
+        self.set_path(path)
 
         # create period folder if it doesn't exist
         if not os.path.exists(self.path):
@@ -90,26 +1325,375 @@ class Period:
 
         # create empty subfolders: original_data -- raw website provided CSV File folder
         #                          Graded Assignments -- filtered assignments for grading purposes
-        self.original_data_folder_path = os.path.join(self.path, "original_data")
         if not os.path.exists(self.original_data_folder_path):
             os.makedirs(self.original_data_folder_path)
-        self.graded_folder_path = os.path.join(self.path, "Graded Assignments")
         if not os.path.exists(self.graded_folder_path):
             os.makedirs(self.graded_folder_path)
 
-        # create CSV file with USERNAME column (for confidential use, no real First & Last name column)
-        csv_file_path = os.path.join(self.path, "gradebook.csv")
-        with open(csv_file_path, mode='w', newline='') as csv_file:
-            fieldnames = ['USERNAME']
-            writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-            writer.writeheader()
+        # create gradebook with USERNAME column (for confidential use, no real First & Last name column)
+        # unless the period folder already has one
+        if not os.path.exists(self.gradebook_path):
+            self.storage.save(pd.DataFrame({'USERNAME': pd.Series(dtype=object)}), self.gradebook_path)
+        self._save_metadata()
+
+        # in-memory copy of the gradebook, kept until the gradebook (or its journal) changes on disk
+        self._gradebook_df = None
+        self._gradebook_version = None
+        self._gradebook_dirty = False
+        self._deferred_writes = 0
+        self._roster_index = None
+        self._journal_length = 0
+        self._summary = None
+        # curves and dropped grades applied to the gradebook, loaded together with it
+        self._adjustments = None
+
+    def __enter__(self):
+        # gradebook writes inside a 'with period:' block are kept in memory until the block exits
+        self._deferred_writes += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._deferred_writes -= 1
+        if self._deferred_writes == 0:
+            self.flush_gradebook()
+        return False
 
     def get_name(self):
         return self.name
 
+    def set_path(self, path):
+        self.path = path
+        self.original_data_folder_path = os.path.join(self.path, "original_data")
+        self.graded_folder_path = os.path.join(self.path, "Graded Assignments")
+        self.gradebook_path = os.path.join(self.path, self.storage.file_name)
+        # gradebook.csv is where CSV exports go when the gradebook itself is stored in another format
+        self.csv_file_path = os.path.join(self.path, "gradebook.csv")
+        self.manifest_path = os.path.join(self.path, "import_manifest.json")
+        self.roster_index_path = os.path.join(self.path, "roster_index.json")
+        self.journal_path = os.path.join(self.path, "gradebook.journal")
+        self.summary_cache_path = os.path.join(self.path, "summary_cache.json")
+        self.adjustments_path = os.path.join(self.path, "adjustments.json")
+
+    def _save_metadata(self):
+        # remember how the gradebook is stored, so the period can be reopened without guessing
+        metadata = {'storage': self.storage_name, 'journal': self.journal}
+        metadata_path = os.path.join(self.path, PERIOD_METADATA_FILE)
+        if os.path.exists(metadata_path):
+            return
+        with open(f"{metadata_path}.tmp", mode='w') as metadata_file:
+            json.dump(metadata, metadata_file, indent=2)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    def get_raw_export_store(self):
+        # the grade year's store when the period is part of one, otherwise a store of its own
+        parent = os.path.dirname(os.path.abspath(self.path))
+        if os.path.exists(os.path.join(parent, GRADEYEAR_METADATA_FILE)):
+            return os.path.join(parent, RAW_EXPORT_STORE)
+        return os.path.join(self.path, RAW_EXPORT_STORE)
+
+    def _archive_raw_export(self, raw_data_path, raw_data_name, sha256):
+        # archive the raw data file into original_data through the content store
+        if not os.path.exists(self.original_data_folder_path):
+            os.makedirs(self.original_data_folder_path)
+        archive_path = os.path.join(self.original_data_folder_path, f"original_{raw_data_name}.csv")
+        with stage('archive_raw_export', period=self.name, assignment=raw_data_name) as record:
+            record['bytes_written'] = archive_raw_export(raw_data_path, archive_path, self.get_raw_export_store(),
+                                                         sha256)
+        return archive_path
+
+    def _get_gradebook_version(self):
+        # (mtime, size) of the stored gradebook, followed by those of its journal if there is one
+        version = self.storage.stat(self.gradebook_path)
+        if os.path.exists(self.journal_path):
+            stat = os.stat(self.journal_path)
+            version += (stat.st_mtime_ns, stat.st_size)
+        return version
+
+    def _get_gradebook(self):
+        # the cached gradebook itself, re-read (and its journal replayed) only if either changed on disk
+        if not self._gradebook_dirty:
+            version = self._get_gradebook_version()
+            if self._gradebook_df is None or version != self._gradebook_version:
+                with stage('load_gradebook', period=self.name) as record:
+                    entries = self.read_journal()
+                    self._gradebook_df = replay_journal_entries(self.storage.load(self.gradebook_path), entries)
+                    record['rows'] = len(self._gradebook_df)
+                    # the version holds (mtime, size) pairs of the gradebook and its journal
+                    record['bytes_read'] = sum(version[1::2])
+                self._gradebook_version = version
+                self._journal_length = len(entries)
+                self._roster_index = self._load_roster_index(version)
+                self._adjustments = self._read_adjustments(entries)
+        return self._gradebook_df
+
+    def load_gradebook(self):
+        # return a copy of the gradebook, so callers can change it freely before saving
+        return self._get_gradebook().copy()
+
+    def save_gradebook(self, df, roster_index=None, journal_entry=None):
+        # keep the updated gradebook in memory and write it out unless writes are deferred.
+        # roster_index is passed by callers that added or reordered rows; otherwise the current
+        # index stays valid only while the USERNAME column is unchanged.
+        # journal_entry describes the change, so a journaled period only appends it to the journal.
+        # An 'adjustment' in the entry (a curve or dropped grades) travels with it into the journal
+        if self._adjustments is None and not self._gradebook_dirty:
+            self._get_gradebook()
+        if journal_entry is not None and 'adjustment' in journal_entry:
+            self._adjustments.append(journal_entry['adjustment'])
+        if roster_index is None and self._roster_index is not None:
+            if self._gradebook_df is None or not self._gradebook_df['USERNAME'].reset_index(drop=True).equals(
+                    df['USERNAME'].reset_index(drop=True)):
+                self._roster_index = None
+        elif roster_index is not None:
+            self._roster_index = roster_index
+        self._gradebook_df = df
+
+        # the journal only holds changes on top of the stored gradebook, so once a full write is
+        # pending every later change waits for that write as well
+        if self.journal and journal_entry is not None and not self._gradebook_dirty:
+            self._append_journal_entry(journal_entry)
+            if self._journal_length >= self.journal_compact_every:
+                self.compact_journal()
+            return
+
+        self._gradebook_dirty = True
+        if self._deferred_writes == 0:
+            self.flush_gradebook()
+
+    def flush_gradebook(self):
+        # write the in-memory gradebook (and its roster index) to storage if it has unsaved changes
+        if self._gradebook_dirty:
+            # write to a temporary file first so a crash never leaves a truncated gradebook behind
+            with stage('write_gradebook', period=self.name) as record:
+                temp_path = f"{self.gradebook_path}.tmp"
+                self.storage.save(self._gradebook_df, temp_path)
+                self.storage.replace(temp_path, self.gradebook_path)
+                record['rows'] = len(self._gradebook_df)
+                record['bytes_written'] = self.storage.stat(self.gradebook_path)[1]
+
+            # everything in the journal is part of the gradebook now, and its adjustments are folded
+            # into adjustments.json. Replaying the journal is idempotent and adjustments are matched
+            # by id, so a crash before it is removed does no harm
+            self._save_adjustments()
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._journal_length = 0
+            self._gradebook_version = self._get_gradebook_version()
+            self._gradebook_dirty = False
+            if self._roster_index is not None:
+                self._save_roster_index()
+
+    def read_journal(self):
+        # journal entries in order. A last line cut short by a crash is dropped from the file,
+        # so that new entries are not appended after it
+        if not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        valid_size = 0
+        with open(self.journal_path, mode='rb') as journal_file:
+            for line in journal_file:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete journal entry")
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_size += len(line)
+        if valid_size < os.path.getsize(self.journal_path):
+            os.truncate(self.journal_path, valid_size)
+        return entries
+
+    def _append_journal_entry(self, entry):
+        entry = dict(entry, seq=self._journal_length + 1, time=time.time())
+        line = json.dumps(entry) + "\n"
+        with stage('journal_append', period=self.name) as record, open(self.journal_path, mode='a') as journal_file:
+            journal_file.write(line)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+            record['bytes_written'] = len(line)
+        self._journal_length += 1
+        self._gradebook_version = self._get_gradebook_version()
+
+    def replay_journal(self):
+        # rebuild the gradebook from the stored base gradebook and the journal, ignoring the cache
+        return replay_journal_entries(self.storage.load(self.gradebook_path), self.read_journal())
+
+    def compact_journal(self):
+        # fold the journal into the base gradebook
+        self._get_gradebook()
+        self._gradebook_dirty = True
+        self.flush_gradebook()
+
+    def undo_last_operation(self):
+        # revert the latest journaled operation that was not undone already
+        if not self.journal:
+            raise ValueError(f"Period '{self.name}' does not keep a journal.")
+        df = self.load_gradebook()
+        entries = self.read_journal()
+        undone = {entry['target'] for entry in entries if entry['op'] == 'undo'}
+        target = next((entry for entry in reversed(entries)
+                       if entry['op'] not in ('undo', 'sort') and entry['seq'] not in undone), None)
+        if target is None:
+            raise ValueError("There is no journaled operation to undo.")
+        # forget the curve or dropped grades of the reverted entry
+        if 'adjustment' in target:
+            self._adjustments = [adjustment for adjustment in self._adjustments
+                                 if adjustment['id'] != target['adjustment']['id']]
+        self.save_gradebook(revert_journal_entry(df, target), journal_entry={'op': 'undo', 'target': target['seq']})
+        return target['op']
+
+    def get_roster_index(self):
+        # normalized username -> gradebook row, rebuilt from the USERNAME column only when missing or stale
+        df = self._get_gradebook()
+        if self._roster_index is None or self._roster_index.size != len(df):
+            self._roster_index = RosterIndex.from_usernames(df['USERNAME'])
+        return self._roster_index
+
+    def _load_roster_index(self, gradebook_version):
+        # the stored roster index, if it was written for this exact version of the gradebook
+        # (it is only a cache, so one that cannot be read is rebuilt from the USERNAME column)
+        if not os.path.exists(self.roster_index_path):
+            return None
+        try:
+            with open(self.roster_index_path, mode='r') as index_file:
+                data = json.load(index_file)
+            if tuple(data.get('gradebook_version', ())) != tuple(gradebook_version):
+                return None
+            return RosterIndex.from_dict(data)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _save_roster_index(self):
+        data = self._roster_index.to_dict()
+        data['gradebook_version'] = list(self._gradebook_version)
+        with open(f"{self.roster_index_path}.tmp", mode='w') as index_file:
+            json.dump(data, index_file)
+        os.replace(f"{self.roster_index_path}.tmp", self.roster_index_path)
+
+    def _sort_by_username(self, df, roster_index=None):
+        # sort the gradebook by 'USERNAME', carrying the roster index positions along with the rows
+        if df['USERNAME'].is_monotonic_increasing:
+            return df, roster_index
+        df = df.reset_index(drop=True).sort_values(by=['USERNAME'], ascending=True, kind='stable')
+        if roster_index is not None:
+            roster_index = roster_index.reordered(df.index.to_numpy())
+        return df.reset_index(drop=True), roster_index
+
+    def get_summary(self):
+        # per-assignment and per-student statistics, plus a percentile sketch of every assignment for
+        # pooling. They are cached in memory and in summary_cache.json, keyed by the gradebook
+        # version, so an unchanged gradebook is not read again
+        version = None if self._gradebook_dirty else list(self._get_gradebook_version())
+        if version is not None:
+            if self._summary is not None and self._summary['version'] == version:
+                return self._summary
+            summary = self._load_summary_cache()
+            if summary is not None and summary['version'] == version:
+                self._summary = summary
+                return summary
+
+        df = self._get_gradebook()
+        assignment_columns = [col for col in df.columns if col != 'USERNAME']
+        scores = df[assignment_columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        scores = scores.reshape(len(df), len(assignment_columns))
+        summary = {
+            'version': version,
+            'assignments': summarize_assignment_scores(assignment_columns, scores),
+            'students': summarize_student_scores(df['USERNAME'].tolist(), scores),
+            'sketches': dict(zip(assignment_columns, score_sketches(scores).tolist())),
+        }
+        if version is not None:
+            self._summary = summary
+            self._save_summary_cache(summary)
+        return summary
+
+    def _load_summary_cache(self):
+        if not os.path.exists(self.summary_cache_path):
+            return None
+        try:
+            with open(self.summary_cache_path, mode='r') as cache_file:
+                data = json.load(cache_file)
+        except ValueError:
+            return None
+        return {
+            'version': data['version'],
+            'assignments': pd.DataFrame(data['assignments'], columns=data['assignment_columns']),
+            'students': pd.DataFrame(data['students'], columns=data['student_columns']),
+            'sketches': data['sketches'],
+        }
+
+    def _save_summary_cache(self, summary):
+        # plain JSON (NaN included), written to a temporary file first like gradeyear.json
+        data = {
+            'version': summary['version'],
+            'assignment_columns': summary['assignments'].columns.tolist(),
+            'assignments': summary['assignments'].values.tolist(),
+            'student_columns': summary['students'].columns.tolist(),
+            'students': summary['students'].values.tolist(),
+            'sketches': summary['sketches'],
+        }
+        with open(f"{self.summary_cache_path}.tmp", mode='w') as cache_file:
+            json.dump(data, cache_file, default=float)
+        os.replace(f"{self.summary_cache_path}.tmp", self.summary_cache_path)
+
+    def reset_gradebook(self):
+        # start over with a gradebook that only has the USERNAME column
+        self._adjustments = []
+        self.save_gradebook(pd.DataFrame({'USERNAME': pd.Series(dtype=object)}))
+
+    def load_adjustments(self):
+        # curves and dropped grades applied to the gradebook, oldest first, for the student reports
+        self._get_gradebook()
+        return list(self._adjustments)
+
+    def _read_adjustments(self, entries):
+        # adjustments folded into adjustments.json, then those of the journal entries that were not
+        # undone. A crash while folding leaves an adjustment in both places, so they are matched by id
+        adjustments = []
+        if os.path.exists(self.adjustments_path):
+            with open(self.adjustments_path, mode='r') as adjustments_file:
+                adjustments = json.load(adjustments_file)
+        folded = {adjustment['id'] for adjustment in adjustments}
+        undone = {entry['target'] for entry in entries if entry['op'] == 'undo'}
+        for entry in entries:
+            if 'adjustment' in entry and entry['seq'] not in undone and entry['adjustment']['id'] not in folded:
+                adjustments.append(entry['adjustment'])
+        return adjustments
+
+    def _save_adjustments(self):
+        # written with the full gradebook; between full writes new adjustments only go to the journal
+        if self._adjustments is None or (not self._adjustments and not os.path.exists(self.adjustments_path)):
+            return
+        temp_path = f"{self.adjustments_path}.tmp"
+        with open(temp_path, mode='w') as adjustments_file:
+            json.dump(self._adjustments, adjustments_file)
+            adjustments_file.flush()
+            os.fsync(adjustments_file.fileno())
+        os.replace(temp_path, self.adjustments_path)
+
+    def export_gradebook_csv(self, csv_path=None):
+        # write the gradebook as CSV, by default to gradebook.csv in the period folder
+        if csv_path is None:
+            csv_path = self.csv_file_path
+        self.load_gradebook().to_csv(csv_path, index=False)
+        return csv_path
+
+    def import_gradebook_csv(self, csv_path=None):
+        # replace the gradebook with the contents of a CSV file, by default gradebook.csv in the period folder
+        if csv_path is None:
+            csv_path = self.csv_file_path
+        df = pd.read_csv(csv_path)
+        if 'USERNAME' not in df.columns:
+            raise ValueError("Could not find a column named 'USERNAME' in the CSV file.")
+        self._adjustments = []
+        self.save_gradebook(df)
+
+    def get_assignment_names(self):
+        # assignment columns of the gradebook, in order
+        return [col for col in self._get_gradebook().columns if col != 'USERNAME']
+
     def print_gradebook_assignments(self):
-        csv_file_path = os.path.join(self.path, "gradebook.csv")
-        df = pd.read_csv(csv_file_path)
+        df = self.load_gradebook()
         columns = df.columns.tolist()
 
         # Find the index of the first assignment column after 'USERNAME'
@@ -123,87 +1707,197 @@ class Period:
                 print(f"{i}. {column}")
 
     def copy_period_tree(self, new_location):
-        # Create a new instance of the Period class for the copied tree
-        copied_period = Period(self.name)
+        # make sure the copied gradebook includes unsaved changes
+        self.flush_gradebook()
 
         # Copy the entire Period tree to the new location
-        shutil.copytree(self.path, new_location)
-
-        # Update the path of the copied_period to the new location
-        copied_period.path = new_location
-
-        # Update the paths of the original_data_folder and graded_folder
-        copied_period.original_data_folder_path = os.path.join(new_location, "original_data")
-        copied_period.graded_folder_path = os.path.join(new_location, "Graded Assignments")
-
-        # Update the csv_file_path (gradebook.csv) to the new location
-        copied_period.csv_file_path = os.path.join(new_location, "gradebook.csv")
-
-        return copied_period
-
-    def import_new_assignment(self, file_path, new_csv_name):
-        # read CSV file into a pandas DataFrame
-        df = pd.read_csv(file_path)
-
-        # Filter grades: drop unwanted columns
-        columns_to_drop = [col for col in df.columns if col not in ['Username', 'Score']]
-        df.drop(columns_to_drop, axis=1, inplace=True)
-
-        # sort by score: from the highest to the lowest, for later use
-        df.sort_values(by=['Score'], ascending=False, inplace=True)
-
-        # save graded assignments CSV file
-        new_file_path = os.path.join(self.graded_folder_path, new_csv_name)
-        df.to_csv(new_file_path, index=False)
-
-    def edpuzzle_filtering(self, raw_data_path):
+        copy_tree(self.path, new_location)
+
+        # open the copied tree as a new Period; its gradebook is already there, so it is kept as is
+        return Period(self.name, path=new_location, storage=self.storage_name, journal=self.journal)
+
+    def load_import_manifest(self):
+        # assignment name -> hash, size, mtime and output of the raw file it was imported from
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, mode='r') as manifest_file:
+            return json.load(manifest_file)
+
+    def _save_import_manifest(self, manifest):
+        # written to a temporary file first, so a crash never leaves a manifest that cannot be read
+        with open(f"{self.manifest_path}.tmp", mode='w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+    def is_import_unchanged(self, raw_data_path, assignment_name):
+        # check if raw_data_path was already imported as assignment_name and has not changed since
+        manifest = self.load_import_manifest()
+        entry = manifest.get(assignment_name)
+        if entry is None or not os.path.exists(os.path.join(self.graded_folder_path, entry['graded_file'])):
+            return False
+
+        stat = os.stat(raw_data_path)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+
+        # same size but a new mtime: only hash the file when the cheap check is not conclusive
+        if file_sha256(raw_data_path) != entry['sha256']:
+            return False
+        entry['mtime_ns'] = stat.st_mtime_ns
+        self._save_import_manifest(manifest)
+        return True
+
+    def _record_import(self, raw_data_path, graded_file_name, sha256):
+        # remember the processed raw file; its gradebook column is (re)built by the next transfer
+        assignment_name = os.path.splitext(graded_file_name)[0]
+        stat = os.stat(raw_data_path)
+        manifest = self.load_import_manifest()
+        manifest[assignment_name] = {
+            'source': os.path.abspath(raw_data_path),
+            'sha256': sha256,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'graded_file': graded_file_name,
+            'columns': [assignment_name],
+            'transferred': False,
+        }
+        self._save_import_manifest(manifest)
+
+    def _mark_transferred(self, assignment_names):
+        manifest = self.load_import_manifest()
+        changed = False
+        for assignment_name in assignment_names:
+            if assignment_name in manifest and not manifest[assignment_name]['transferred']:
+                manifest[assignment_name]['transferred'] = True
+                changed = True
+        if changed:
+            self._save_import_manifest(manifest)
+
+    def _get_stale_assignments(self):
+        # assignments whose raw file changed after their column was added to the gradebook
+        return {name for name, entry in self.load_import_manifest().items() if not entry['transferred']}
+
+    def reread_graded_assignments(self, assignment_names=None):
+        # build the columns of these assignments (by default every imported one) again from their
+        # graded files, without the pipeline steps that were applied to them
+        manifest = self.load_import_manifest()
+        for assignment_name in manifest if assignment_names is None else assignment_names:
+            manifest[assignment_name]['transferred'] = False
+            manifest[assignment_name].pop('steps', None)
+        self._save_import_manifest(manifest)
+        return self.transfer_all_graded_to_gradebook()
+
+    def apply_pipeline_steps(self, steps):
+        # run the post-processing steps of a pipeline file on the assignments that did not get exactly
+        # these steps yet, so running the same pipeline again leaves the gradebook alone. The steps
+        # applied to each assignment are kept in the import manifest. An assignment that got other
+        # steps is read again from its graded file first, and so is every assignment when a step that
+        # looks at all grades of a student has to run. Gradebook columns the pipeline did not import
+        # are left to whoever added them. Returns the assignments the steps ran on
+        signatures = [json.dumps(step, sort_keys=True) for step in steps]
+        applied = {name: entry.get('steps') for name, entry in self.load_import_manifest().items()}
+        pending = {name for name, done in applied.items() if done != signatures}
+        if not pending:
+            return []
+        if any(step['step'] in ROW_PIPELINE_STEPS for step in steps):
+            reread = {name for name, done in applied.items() if done is not None}
+        else:
+            reread = {name for name in pending if applied[name] is not None}
+        pending |= reread
+        done = (set(applied) | set(self.get_assignment_names())) - pending
+
+        with self:
+            if reread:
+                self.reread_graded_assignments(sorted(reread))
+            for step in steps:
+                PIPELINE_STEPS[step['step']](self, step, done)
+
+        manifest = self.load_import_manifest()
+        for assignment_name in pending:
+            manifest[assignment_name]['steps'] = signatures
+        self._save_import_manifest(manifest)
+        return sorted(pending)
+
+    def import_new_assignment(self, file_path, new_csv_name, force=False):
+        # skip files that were already imported and have not changed
+        assignment_name = os.path.splitext(new_csv_name)[0]
+        if not force and self.is_import_unchanged(file_path, assignment_name):
+            return False
+
+        hasher = hashlib.sha256()
+        with stage('import_new_assignment', period=self.name, assignment=assignment_name) as record:
+            # read only the username and score columns, whichever format the file is in
+            df = concat_score_chunks(read_export_scores(file_path, hasher=hasher))
+
+            # sort by score: from the highest to the lowest, for later use
+            df.sort_values(by=['Score'], ascending=False, inplace=True)
+
+            # save graded assignments CSV file
+            new_file_path = os.path.join(self.graded_folder_path, new_csv_name)
+            df.to_csv(new_file_path, index=False)
+            record.update(rows=len(df), bytes_read=os.path.getsize(file_path),
+                          bytes_written=os.path.getsize(new_file_path))
+
+        self._record_import(file_path, new_csv_name, hasher.hexdigest())
+        return True
+
+    def edpuzzle_filtering(self, raw_data_path, chunksize=EXPORT_CHUNKSIZE, force=False):
         # get the basename of the raw data file
         raw_data_name = os.path.splitext(os.path.basename(raw_data_path))[0]
 
-        # create original_data folder if it doesn't exist
-        if not os.path.exists(self.original_data_folder_path):
-            os.makedirs(self.original_data_folder_path)
-
-        # create a copy of the raw data file in the original_data folder
-        with open(raw_data_path, mode='r') as f1, open(
-                os.path.join(self.original_data_folder_path, f"original_{raw_data_name}.csv"), mode='w',
-                newline='') as f2:
-            reader = csv.reader(f1)
-            writer = csv.writer(f2)
-            writer.writerows(reader)
+        # skip raw files that were already filtered and have not changed
+        if not force and self.is_import_unchanged(raw_data_path, raw_data_name):
+            return False
 
-        # create a new CSV file in the Graded Assignments folder with the same name as the raw data file
+        # stream the raw data once: the bytes are hashed while only the 'Username' and
+        # 'Grade (out of 100)' columns are parsed, and the valid pairs of username and score are
+        # written to the Graded Assignments folder chunk by chunk
         graded_file_path = os.path.join(self.graded_folder_path, f"{raw_data_name}.csv")
-        with open(graded_file_path, mode='w', newline='') as csv_file:
-            fieldnames = ['Username', 'Score']
-            writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-            writer.writeheader()
-
-        # read the raw data into a pandas DataFrame
-        raw_data_df = pd.read_csv(raw_data_path)
-
-        # find column with header that matches 'Username' and 'Grade (out of 100)' (case-insensitive)
-        username_col_index = None
-        score_col_index = None
-        with open(raw_data_path, mode='r') as input_file:
-            reader = csv.reader(input_file)
-            headers = next(reader)
-            for i, h in enumerate(headers):
-                if h.upper() == 'USERNAME':
-                    username_col_index = i
-                elif h.upper() == 'GRADE (OUT OF 100)':
-                    score_col_index = i
-        if username_col_index is None or score_col_index is None:
-            raise ValueError("Could not find columns named 'Username' and 'Grade (out of 100)' in the raw data file.")
-
-        # iterate through rows of the raw data and insert the valid pairs of username and score into the new CSV file
-        with open(graded_file_path, mode='a', newline='') as csv_file:
+        hasher = hashlib.sha256()
+        with stage('edpuzzle_filtering', period=self.name, assignment=raw_data_name) as record, \
+                open(graded_file_path, mode='w', newline='') as csv_file:
             writer = csv.writer(csv_file)
-            for index, row in raw_data_df.iterrows():
-                username = row.iloc[username_col_index]
-                score = row.iloc[score_col_index]
-                if pd.notnull(username) and pd.notnull(score):
-                    writer.writerow([username, score])
+            writer.writerow(['Username', 'Score'])
+            for chunk in read_export_scores(raw_data_path, chunksize=chunksize, hasher=hasher):
+                chunk.to_csv(csv_file, header=False, index=False)
+                record['rows'] += len(chunk)
+            record['bytes_read'] = os.path.getsize(raw_data_path)
+            record['bytes_written'] = csv_file.tell()
+
+        # then keep the raw data in original_data, shared with identical exports already archived
+        self._archive_raw_export(raw_data_path, raw_data_name, hasher.hexdigest())
+
+        self._record_import(raw_data_path, f"{raw_data_name}.csv", hasher.hexdigest())
+        return True
+
+    def import_edpuzzle_scores(self, raw_data_path, scores_df, sha256=None):
+        # archive the raw data file and write already parsed scores to the Graded Assignments folder
+        raw_data_name = os.path.splitext(os.path.basename(raw_data_path))[0]
+        if sha256 is None:
+            sha256 = file_sha256(raw_data_path)
+        self._archive_raw_export(raw_data_path, raw_data_name, sha256)
+
+        with stage('import_edpuzzle_scores', period=self.name, assignment=raw_data_name) as record:
+            graded_file_path = os.path.join(self.graded_folder_path, f"{raw_data_name}.csv")
+            scores_df[['Username', 'Score']].to_csv(graded_file_path, index=False)
+            record['rows'] = len(scores_df)
+            record['bytes_written'] = os.path.getsize(graded_file_path)
+        self._record_import(raw_data_path, f"{raw_data_name}.csv", sha256)
+
+        # transfer the new assignment to the gradebook
+        return self.transfer_all_graded_to_gradebook()
+
+    def import_roster_scores(self, raw_data_path, scores_df, score_keys, sha256, min_overlap=0):
+        # import the rows of an already parsed export that belong to this period's roster, or
+        # return None without importing when fewer than min_overlap of them do
+        with stage('partition_scores', period=self.name) as record:
+            in_roster = self.get_roster_index().lookup(score_keys) >= 0
+            record['rows'] = len(score_keys)
+        if in_roster.sum() < min_overlap:
+            return None
+        return self.import_edpuzzle_scores(raw_data_path, scores_df[in_roster], sha256)
 
     def add_usernames_to_gradebook(self, csv_path):
         # find column with header that matches 'USERNAME' (case-insensitive)
@@ -215,141 +1909,601 @@ class Period:
         if username_col_index is None:
             raise ValueError("Could not find a column named 'USERNAME' in the CSV file.")
 
-        # read existing CSV file into a pandas DataFrame
-        csv_file_path = os.path.join(self.path, "gradebook.csv")
-        df = pd.read_csv(csv_file_path)
-
-        # get unique usernames from the specified column
-        usernames = set(pd.read_csv(csv_path, usecols=[username_col_index]).iloc[:, 0])
+        # read existing gradebook into a pandas DataFrame
+        df = self.load_gradebook().reset_index(drop=True)
+        roster_index = self.get_roster_index()
+
+        # insert the usernames that are not in the roster yet; usernames that are already there
+        # (case-insensitive, including repeats within the file) are reported instead of added twice
+        with stage('add_usernames', period=self.name) as record:
+            usernames = pd.read_csv(csv_path, usecols=[username_col_index], dtype=str).iloc[:, 0].dropna()
+            new_usernames = []
+            duplicates = []
+            for username in usernames:
+                if username in roster_index:
+                    duplicates.append(username)
+                else:
+                    roster_index.insert(username)
+                    new_usernames.append(username)
+            record.update(rows=len(usernames), bytes_read=os.path.getsize(csv_path))
 
-        # add new usernames to the existing DataFrame and save to CSV file
-        new_df = pd.DataFrame({'USERNAME': list(usernames)})
+        # add new usernames to the existing DataFrame and save the gradebook
+        new_df = pd.DataFrame({'USERNAME': new_usernames})
         df = pd.concat([df, new_df], ignore_index=True, sort=False)
-        df.sort_values(by=['USERNAME'], inplace=True)
-        df.to_csv(csv_file_path, index=False)
+        df, roster_index = self._sort_by_username(df, roster_index)
+        self.save_gradebook(df, roster_index, journal_entry={'op': 'add_usernames', 'usernames': new_usernames})
+
+        return {'added': len(new_usernames), 'duplicates': duplicates}
 
     def transfer_assignment_scores_to_gradebook(self, assignment_path):
         # get the basename of the assignment file
         assignment_name = os.path.splitext(os.path.basename(assignment_path))[0]
 
         # read the assignment scores into a pandas DataFrame
-        df = pd.read_csv(assignment_path)
+        df = self._read_graded_assignment(assignment_path)
 
         # check if the assignment name matches an existing column header in the gradebook CSV
-        csv_file_path = os.path.join(self.path, "gradebook.csv")
-        gradebook_df = pd.read_csv(csv_file_path)
+        gradebook_df = self.load_gradebook()
         if assignment_name in gradebook_df.columns:
             raise ValueError(f"The assignment '{assignment_name}' already exists in the gradebook.")
-
-        # create a new column in the gradebook CSV with the assignment name as the header
-        gradebook_df[assignment_name] = ""
-
-        # map and insert the scores into the new column based on the 'USERNAME' column
-        username_col_index = next((i for i, h in enumerate(gradebook_df.columns) if h.upper() == 'USERNAME'), None)
-        if username_col_index is None:
+        if 'USERNAME' not in gradebook_df.columns:
             raise ValueError("Could not find a column named 'USERNAME' in the gradebook CSV file.")
-        for index, row in df.iterrows():
-            username = row.iloc[username_col_index]
-            score = row['Score']
-            gradebook_df.loc[gradebook_df['USERNAME'].str.upper() == username.upper(), assignment_name] = score
+
+        # place the scores on the gradebook rows through the case-insensitive roster index
+        roster_index = self.get_roster_index()
+        scores, report = self._match_scores(roster_index, df)
+        gradebook_df[assignment_name] = scores
+        journal_entry = score_change_entry('add_column', None, gradebook_df, [assignment_name], [assignment_name])
 
         # sort the gradebook by 'USERNAME'
-        gradebook_df.sort_values(by=['USERNAME'], ascending=True, inplace=True)
+        gradebook_df, roster_index = self._sort_by_username(gradebook_df, roster_index)
 
-        # save the updated gradebook CSV file
-        gradebook_df.to_csv(csv_file_path, index=False)
+        # save the updated gradebook
+        self.save_gradebook(gradebook_df, roster_index, journal_entry)
 
-    def transfer_all_graded_to_gradebook(self):
+        return report
+
+    def transfer_all_graded_to_gradebook(self, batch=True):
         graded_folder_path = self.graded_folder_path
         csv_files = [f for f in os.listdir(graded_folder_path) if
                      os.path.isfile(os.path.join(graded_folder_path, f)) and f.lower().endswith('.csv')]
 
+        if not batch:
+            return self._transfer_graded_one_by_one(csv_files)
+
+        # read the gradebook CSV once for the whole folder
+        gradebook_df = self.load_gradebook()
+        if 'USERNAME' not in gradebook_df.columns:
+            raise ValueError("Could not find a column named 'USERNAME' in the gradebook CSV file.")
+
+        # build every new assignment column in memory, skipping the ones already in the gradebook
+        # unless their raw file changed since they were added
+        stale_assignments = self._get_stale_assignments()
+        roster_index = self.get_roster_index()
+        new_columns = {}
+        updated_columns = {}
+        skipped = []
+        reports = {}
+        for csv_file in sorted(csv_files):
+            assignment_name = os.path.splitext(csv_file)[0]
+            if assignment_name in new_columns or assignment_name in updated_columns or \
+                    (assignment_name in gradebook_df.columns and assignment_name not in stale_assignments):
+                skipped.append(assignment_name)
+                continue
+            assignment_df = self._read_graded_assignment(os.path.join(graded_folder_path, csv_file))
+            scores, reports[assignment_name] = self._match_scores(roster_index, assignment_df)
+            if assignment_name in gradebook_df.columns:
+                updated_columns[assignment_name] = scores
+            else:
+                new_columns[assignment_name] = scores
+
+        # rebuild changed columns in place and merge all new columns in one concat,
+        # then sort and write the gradebook once
+        if new_columns or updated_columns:
+            with stage('merge_columns', period=self.name) as record:
+                previous_df = gradebook_df[list(updated_columns)].copy()
+                for assignment_name, scores in updated_columns.items():
+                    gradebook_df[assignment_name] = scores
+                if new_columns:
+                    gradebook_df = pd.concat([gradebook_df, pd.DataFrame(new_columns, index=gradebook_df.index)],
+                                             axis=1)
+                journal_entry = score_change_entry('add_columns', previous_df, gradebook_df,
+                                                   list(updated_columns) + list(new_columns), list(new_columns))
+                if updated_columns:
+                    # curves and dropped grades of the old scores no longer apply
+                    journal_entry['adjustment'] = adjustment_entry('reimport', assignments=list(updated_columns))
+                gradebook_df, roster_index = self._sort_by_username(gradebook_df, roster_index)
+                record['rows'] = len(gradebook_df) * (len(new_columns) + len(updated_columns))
+            self.save_gradebook(gradebook_df, roster_index, journal_entry)
+        self._mark_transferred(reports)
+
+        return {'added': len(new_columns), 'updated': len(updated_columns), 'skipped': len(skipped),
+                'skipped_assignments': skipped, 'reports': reports}
+
+    def _read_graded_assignment(self, assignment_path):
+        with stage('read_assignment', period=self.name) as record:
+            df = pd.read_csv(assignment_path)
+            record.update(rows=len(df), bytes_read=os.path.getsize(assignment_path))
+        return df
+
+    def _match_scores(self, roster_index, assignment_df):
+        with stage('match_scores', period=self.name) as record:
+            record['rows'] = len(assignment_df)
+            return match_assignment_scores(roster_index, assignment_df)
+
+    def _transfer_graded_one_by_one(self, csv_files):
+        stale_assignments = self._get_stale_assignments()
+        added = 0
+        updated = 0
+        skipped = []
+        reports = {}
         for csv_file in csv_files:
             # check if the assignment name already exists in the gradebook CSV
             assignment_name = os.path.splitext(csv_file)[0]
-            csv_file_path = os.path.join(self.path, "gradebook.csv")
-            gradebook_df = pd.read_csv(csv_file_path)
-            if assignment_name not in gradebook_df.columns:
-                # transfer the assignment scores to the gradebook
-                assignment_path = os.path.join(graded_folder_path, csv_file)
-                self.transfer_assignment_scores_to_gradebook(assignment_path)
+            gradebook_df = self.load_gradebook()
+            if assignment_name in gradebook_df.columns and assignment_name in stale_assignments:
+                # the raw file changed: drop the old column so it is rebuilt below, and forget the
+                # curves and dropped grades of its old scores
+                self._adjustments.append(adjustment_entry('reimport', assignments=[assignment_name]))
+                self.save_gradebook(gradebook_df.drop(columns=[assignment_name]))
+                updated += 1
+            elif assignment_name in gradebook_df.columns:
+                skipped.append(assignment_name)
+                continue
+            else:
+                added += 1
+            # transfer the assignment scores to the gradebook
+            assignment_path = os.path.join(self.graded_folder_path, csv_file)
+            reports[assignment_name] = self.transfer_assignment_scores_to_gradebook(assignment_path)
+            self._mark_transferred([assignment_name])
+
+        return {'added': added, 'updated': updated, 'skipped': len(skipped), 'skipped_assignments': skipped,
+                'reports': reports}
 
     def sort_gradebook_by_username(self):
         # read existing CSV file into a pandas DataFrame
-        csv_file_path = os.path.join(self.path, "gradebook.csv")
-        df = pd.read_csv(csv_file_path)
+        df = self.load_gradebook()
 
         # sort the gradebook by 'USERNAME'
-        df.sort_values(by=['USERNAME'], ascending=True, inplace=True)
+        df, roster_index = self._sort_by_username(df, self._roster_index)
 
-        # save the updated gradebook CSV file
-        df.to_csv(csv_file_path, index=False)
+        # save the updated gradebook
+        self.save_gradebook(df, roster_index, journal_entry={'op': 'sort'})
 
     def bump_to_hundred(self, assignment_name):
-        # read existing CSV file into a pandas DataFrame
-        csv_file_path = os.path.join(self.path, "gradebook.csv")
-        df = pd.read_csv(csv_file_path)
-
-        # check if the assignment name matches an existing column header in the gradebook CSV
-        if assignment_name not in df.columns:
-            raise ValueError(f"The assignment '{assignment_name}' does not exist in the gradebook.")
-
-        # find the highest grade in the assignment column
-        max_grade = df[assignment_name].max()
-
-        # subtract the max grade from 100 to get the bump value
-        bump_value = 100 - max_grade
-
-        # add the bump value to each grade in the assignment column
-        df[assignment_name] = df[assignment_name].apply(lambda x: x + bump_value)
-
-        # save the updated gradebook CSV file
-        df.to_csv(csv_file_path, index=False)
-
-    def drop_lowest(self):
+        # shift every grade of the assignment so the highest one becomes 100
+        self.curve([assignment_name], strategy='shift_to_max')
+
+    def curve(self, assignment_names, strategy='shift_to_max', max_scores=None, cap=False):
+        # curve several assignments with one gradebook load and save. max_scores maps assignment
+        # names to the maximum to curve against (by default the highest score in this period)
+        df = self.load_gradebook()
+
+        # check if the assignment names match existing column headers in the gradebook
+        assignment_names = list(assignment_names)
+        for assignment_name in assignment_names:
+            if assignment_name not in df.columns:
+                raise ValueError(f"The assignment '{assignment_name}' does not exist in the gradebook.")
+        if not assignment_names:
+            return {}
+        if max_scores is not None:
+            # assignments missing from max_scores are curved against their own highest score
+            max_scores = [max_scores.get(assignment_name, np.nan) for assignment_name in assignment_names]
+
+        # curve all columns at once
+        previous_df = df[assignment_names].copy()
+        with stage('curve', period=self.name, strategy=strategy) as record:
+            scores = df[assignment_names].to_numpy(dtype=float)
+            curved = curve_scores(scores, strategy, max_scores, cap)
+            df[assignment_names] = curved
+            record['rows'] = len(df) * len(assignment_names)
+
+        # save the updated gradebook, remembering the curve for the student reports
+        journal_entry = score_change_entry('curve', previous_df, df, assignment_names)
+        journal_entry['adjustment'] = adjustment_entry('curve', assignments=assignment_names, strategy=strategy,
+                                                       cap=cap)
+        self.save_gradebook(df, journal_entry=journal_entry)
+
+        # points added on average to each assignment, for reporting
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            mean_change = np.nanmean(curved - scores, axis=0) if len(df) else np.full(len(assignment_names), np.nan)
+        return dict(zip(assignment_names, mean_change.tolist()))
+
+    def drop_lowest(self, n=1):
         # read in the gradebook CSV as a pandas DataFrame
-        csv_file_path = os.path.join(self.path, "gradebook.csv")
-        df = pd.read_csv(csv_file_path)
-
-        # iterate through each row of the DataFrame and find the lowest non-zero grade
-        for index, row in df.iterrows():
-            # find the average grade for the row
-            grade_sum = 0
-            grade_count = 0
-            for col, grade in row.items():
-                if col == "USERNAME":
-                    continue
-                if pd.notnull(grade):
-                    grade_sum += grade
-                    grade_count += 1
-            average_grade = grade_sum / grade_count if grade_count > 0 else 0  # add check for grade_count > 0
-
-            # find the lowest grade in the row
-            lowest_grade = float('inf')
-            for col, grade in row.items():
-                if col == "USERNAME":
-                    continue
-                if pd.notnull(grade):
-                    if grade < lowest_grade:
-                        lowest_grade = grade
-
-            # replace the lowest grade with the ceiling-rounded average grade
-            for col, grade in row.items():
-                if col == "USERNAME":
-                    continue
-                if pd.notnull(grade):
-                    if grade == lowest_grade:
-                        new_grade = math.ceil(average_grade)
-                        df.at[index, col] = new_grade
+        df = self.load_gradebook()
+
+        # replace the n lowest grades of every student with their ceiling-rounded average grade
+        assignment_columns = [col for col in df.columns if col != "USERNAME"]
+        previous_df = df[assignment_columns].copy()
+        dropped = {}
+        if assignment_columns:
+            with stage('drop_lowest', period=self.name) as record:
+                scores = df[assignment_columns].to_numpy(dtype=float)
+                new_scores = drop_lowest_scores(scores, n)
+                df[assignment_columns] = new_scores
+                record['rows'] = len(df)
+
+            # username -> {assignment: grade before it was dropped}, for the student reports
+            for row, col in zip(*np.nonzero(~np.isnan(scores) & (scores != new_scores))):
+                dropped.setdefault(df['USERNAME'].iloc[row], {})[assignment_columns[col]] = scores[row, col]
+        journal_entry = score_change_entry('drop_lowest', previous_df, df, assignment_columns)
+        journal_entry['adjustment'] = adjustment_entry('drop_lowest', n=n, dropped=dropped)
 
         # sort the gradebook by 'USERNAME'
-        df.sort_values(by=['USERNAME'], inplace=True)
+        df, roster_index = self._sort_by_username(df, self._roster_index)
+
+        # save the updated gradebook
+        self.save_gradebook(df, roster_index, journal_entry)
+
+    def get_student_records(self):
+        # one record per student with every score and whether it was curved or dropped, built
+        # from a single read of the gradebook and its adjustments
+        df = self._get_gradebook()
+        assignment_names = [col for col in df.columns if col != 'USERNAME']
+        curved = {}
+        dropped = {}
+        for entry in self.load_adjustments():
+            if entry['op'] == 'curve':
+                for assignment_name in entry['assignments']:
+                    curved.setdefault(assignment_name, []).append(entry['strategy'])
+            elif entry['op'] == 'drop_lowest':
+                for username, grades in entry['dropped'].items():
+                    for assignment_name, grade in grades.items():
+                        # keep the grade from before the first drop
+                        dropped.setdefault(username, {}).setdefault(assignment_name, grade)
+            elif entry['op'] == 'reimport':
+                for assignment_name in entry['assignments']:
+                    curved.pop(assignment_name, None)
+                    for grades in dropped.values():
+                        grades.pop(assignment_name, None)
+
+        scores = df[assignment_names].to_numpy(dtype=float).reshape(len(df), len(assignment_names))
+        students = summarize_student_scores(df['USERNAME'].tolist(), scores)
+        records = []
+        for row, student in enumerate(students.itertuples(index=False)):
+            records.append({
+                'period': self.name,
+                'username': student.USERNAME,
+                'average': student.average,
+                'graded': int(student.graded),
+                'missing': int(student.missing),
+                'assignments': [{'assignment': assignment_name,
+                                 'score': scores[row, col],
+                                 'curve': ', '.join(curved.get(assignment_name, [])),
+                                 'dropped': dropped.get(student.USERNAME, {}).get(assignment_name)}
+                                for col, assignment_name in enumerate(assignment_names)],
+            })
+        return records
+
+# steps that a pipeline file can run on each period after its assignments are imported. `done`
+# holds the assignments that already got these steps on an earlier run and are left alone
+PIPELINE_STEPS = {
+    'drop_lowest': lambda period, step, done: period.drop_lowest(step.get('n', 1)),
+    'bump_to_hundred': lambda period, step, done: period.curve(
+        [name for name in [step['assignment']] if name not in done], 'shift_to_max'),
+    'curve': lambda period, step, done: period.curve(
+        [name for name in step['assignments'] if name not in done], step.get('strategy', 'shift_to_max'),
+        cap=step.get('cap', False)),
+}
+
+# keys every step of a kind needs in the pipeline file
+PIPELINE_STEP_KEYS = {
+    'drop_lowest': (),
+    'bump_to_hundred': ('assignment',),
+    'curve': ('assignments',),
+}
+
+# steps that look at every grade of a student instead of one assignment at a time
+ROW_PIPELINE_STEPS = {'drop_lowest'}
+
+# how each assignment format of a pipeline file is brought into a period
+ASSIGNMENT_IMPORTERS = {
+    'edpuzzle': lambda period, path: period.edpuzzle_filtering(path),
+    'scores': lambda period, path: period.import_new_assignment(path, os.path.basename(path)),
+}
+
+
+def load_pipeline(pipeline_path):
+    # read a pipeline file and resolve its paths and globs into a plan of grade years and periods
+    with open(pipeline_path, mode='r') as pipeline_file:
+        pipeline = json.load(pipeline_file)
+    base_dir = os.path.dirname(os.path.abspath(pipeline_path))
+
+    def resolve(path):
+        return os.path.join(base_dir, os.path.expanduser(path))
+
+    def resolve_assignments(specs):
+        assignments = []
+        for spec in specs:
+            if isinstance(spec, str):
+                spec = {'path': spec}
+            assignment_format = spec.get('format', 'edpuzzle')
+            if assignment_format not in ASSIGNMENT_IMPORTERS:
+                raise ValueError(f"Unknown assignment format '{assignment_format}' in the pipeline file.")
+            assignments.extend((path, assignment_format) for path in sorted(glob.glob(resolve(spec['path']))))
+        return assignments
+
+    def check_steps(steps):
+        for step in steps:
+            if step.get('step') not in PIPELINE_STEPS:
+                raise ValueError(f"Unknown pipeline step '{step.get('step')}' in the pipeline file.")
+            missing = [key for key in PIPELINE_STEP_KEYS[step['step']] if key not in step]
+            if missing:
+                raise ValueError(f"The pipeline step '{step['step']}' needs {', '.join(map(repr, missing))}.")
+            if step.get('strategy', 'shift_to_max') not in CURVE_STRATEGIES:
+                raise ValueError(f"Unknown curve strategy '{step['strategy']}' in the pipeline file.")
+        return steps
+
+    plan = []
+    for year_spec in pipeline.get('grade_years', []):
+        if 'year' not in year_spec:
+            raise ValueError("Every grade year in the pipeline file needs a 'year'.")
+        year_steps = check_steps(year_spec.get('steps', []))
+        periods = []
+        for period_spec in year_spec.get('periods', []):
+            if 'name' not in period_spec:
+                raise ValueError(f"Every period of grade year '{year_spec['year']}' needs a 'name'.")
+            periods.append({
+                'name': str(period_spec['name']),
+                'roster': resolve(period_spec['roster']) if period_spec.get('roster') else None,
+                'assignments': resolve_assignments(period_spec.get('assignments', [])),
+                'steps': year_steps + check_steps(period_spec.get('steps', [])),
+            })
+        plan.append({
+            'year': str(year_spec['year']),
+            'location': resolve(year_spec['location']) if year_spec.get('location') else None,
+            # None keeps the settings of periods that already exist, and makes new ones CSV without a journal
+            'storage': year_spec.get('storage'),
+            'journal': bool(year_spec['journal']) if 'journal' in year_spec else None,
+            'periods': periods,
+            'universal_assignments': [path for path, _ in
+                                      resolve_assignments(year_spec.get('universal_assignments', []))],
+        })
+    return plan
+
+
+def print_pipeline_plan(plan):
+    for year_plan in plan:
+        location = year_plan['location'] or os.path.join(os.path.expanduser("~"), "Desktop")
+        print(f"Grade Year {year_plan['year']} in {os.path.join(location, year_plan['year'])} "
+              f"({year_plan['storage'] or 'csv'} gradebooks)")
+        for period_plan in year_plan['periods']:
+            print(f"  Period {period_plan['name']}")
+            if period_plan['roster']:
+                print(f"    roster: {period_plan['roster']}")
+            for path, assignment_format in period_plan['assignments']:
+                print(f"    import ({assignment_format}): {path}")
+            for step in period_plan['steps']:
+                print(f"    step: {json.dumps(step)}")
+        for path in year_plan['universal_assignments']:
+            print(f"  universal assignment: {path}")
+
+
+def run_pipeline(pipeline_path, max_workers=1, dry_run=False):
+    plan = load_pipeline(pipeline_path)
+    if dry_run:
+        print_pipeline_plan(plan)
+        return plan
 
-        # save the updated gradebook CSV file
-        df.to_csv(csv_file_path, index=False)
+    gradeyears = []
+    for year_plan in plan:
+        start = time.perf_counter()
+        if year_plan['location'] is None:
+            gradeyear = GradeYear(year_plan['year'])
+        else:
+            gradeyear = GradeYear(year_plan['year'], gradeyear_location=year_plan['location'])
+            os.makedirs(gradeyear.path, exist_ok=True)
+
+        for period_plan in year_plan['periods']:
+            gradeyear.create_period(period_plan['name'], storage=year_plan['storage'], journal=year_plan['journal'])
+
+        # roster and assignments of each period, then one batch transfer into its gradebook. Exports
+        # that were already imported and did not change are skipped
+        def import_period(period_plan):
+            period = gradeyear.get_period(period_plan['name'])
+            with period:
+                if period_plan['roster'] and period.add_usernames_to_gradebook(period_plan['roster'])['added']:
+                    # new students: their scores are in the graded files of the earlier imports
+                    period.reread_graded_assignments()
+                for path, assignment_format in period_plan['assignments']:
+                    ASSIGNMENT_IMPORTERS[assignment_format](period, path)
+                return period.transfer_all_graded_to_gradebook()
+
+        results = map_in_threads(import_period, year_plan['periods'], max_workers)
+        for period_plan, result in zip(year_plan['periods'], results):
+            print(f"[{year_plan['year']}/{period_plan['name']}] {result['added']} assignments added, "
+                  f"{result['updated']} updated, {result['skipped']} skipped")
+
+        # assignments shared by every period are parsed once for the whole grade year
+        for path in year_plan['universal_assignments']:
+            gradeyear.bulk_import_edpuzzle_assignment(path, max_workers=max_workers)
+            print(f"[{year_plan['year']}] universal assignment {os.path.basename(path)} imported")
+
+        # post-processing steps, with a single gradebook load and save per period. Assignments that
+        # got the same steps on an earlier run are not changed again
+        def run_steps(period_plan):
+            return gradeyear.get_period(period_plan['name']).apply_pipeline_steps(period_plan['steps'])
+
+        results = map_in_threads(run_steps, year_plan['periods'], max_workers)
+        for period_plan, stepped in zip(year_plan['periods'], results):
+            if period_plan['steps']:
+                print(f"[{year_plan['year']}/{period_plan['name']}] steps applied to {len(stepped)} assignments")
+
+        print(f"[{year_plan['year']}] {len(year_plan['periods'])} periods done in {time.perf_counter() - start:.2f}s")
+        gradeyears.append(gradeyear)
+    return gradeyears
+
+
+# seconds between two scans of the watched folders, and how long a new export has to stay
+# unchanged before it is read (browsers write a download in several steps)
+WATCH_POLL_INTERVAL = 1.0
+WATCH_SETTLE_TIME = 2.0
+
+
+class ExportWatcher:
+    # watches drop folders for Edpuzzle exports and imports every finished export into the periods
+    # of a grade year whose rosters it overlaps. Exports are parsed and imported by a bounded pool
+    # of worker threads; a period is only updated by one worker at a time
+    def __init__(self, gradeyear, folders, max_workers=4, poll_interval=WATCH_POLL_INTERVAL,
+                 settle_time=WATCH_SETTLE_TIME, min_overlap=1):
+        self.gradeyear = gradeyear
+        self.folders = list(folders)
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.min_overlap = min_overlap
+
+        # open every period up front, so the worker threads never open one concurrently
+        self.periods = gradeyear.get_periods()
+        self._period_locks = {period.get_name(): threading.Lock() for period in self.periods}
+
+        # path -> (size, mtime) and the time it was first seen that way, for files still being written
+        self._pending = {}
+        # path -> (size, mtime) of files that were already handed to a worker
+        self._handled = {}
+        self._loop = None
+        self._stopping = None
+
+    def scan(self):
+        # exports in the watched folders whose size and mtime stayed the same for settle_time seconds
+        now = time.monotonic()
+        ready = []
+        for folder in self.folders:
+            for path in sorted(glob.glob(os.path.join(folder, "*.csv"))):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._handled.get(path) == signature:
+                    continue
+                pending = self._pending.get(path)
+                if pending is None or pending[0] != signature:
+                    self._pending[path] = (signature, now)
+                elif now - pending[1] >= self.settle_time:
+                    del self._pending[path]
+                    self._handled[path] = signature
+                    ready.append(path)
+        return ready
+
+    def ingest(self, path):
+        # parse the export once and import it into every period it overlaps; returns the names of
+        # the periods that were updated
+        assignment_name = os.path.splitext(os.path.basename(path))[0]
+
+        # periods that already imported this exact file are left alone, the others still get it
+        periods = []
+        for period in self.periods:
+            with self._period_locks[period.get_name()]:
+                if not period.is_import_unchanged(path, assignment_name):
+                    periods.append(period)
+        if not periods:
+            return []
+
+        scores_df, score_keys, sha256 = parse_export(path)
+        updated = []
+        for period in periods:
+            with self._period_locks[period.get_name()]:
+                if period.import_roster_scores(path, scores_df, score_keys, sha256, self.min_overlap) is not None:
+                    updated.append(period.get_name())
+        return updated
+
+    async def _worker(self, queue, executor):
+        while True:
+            path = await queue.get()
+            start = time.perf_counter()
+            try:
+                updated = await self._loop.run_in_executor(executor, self.ingest, path)
+                if updated:
+                    print(f"[watch] {os.path.basename(path)} imported into {', '.join(updated)} "
+                          f"in {time.perf_counter() - start:.2f}s")
+                else:
+                    print(f"[watch] {os.path.basename(path)} skipped: already imported or no matching roster")
+            except Exception as e:
+                # one bad file must not stop the watcher; it is retried only once it changes
+                print(f"[watch] could not import {os.path.basename(path)}: {e}")
+            finally:
+                queue.task_done()
+
+    async def run(self):
+        # scan the folders until stop() is called, then finish the exports already queued
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        queue = asyncio.Queue()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            workers = [asyncio.create_task(self._worker(queue, executor)) for _ in range(self.max_workers)]
+            while not self._stopping.is_set():
+                for path in self.scan():
+                    queue.put_nowait(path)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def stop(self):
+        # safe to call from any thread
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+
+def watch_exports(gradeyear, folders, max_workers=4, settle_time=WATCH_SETTLE_TIME, min_overlap=1):
+    watcher = ExportWatcher(gradeyear, folders, max_workers=max_workers, settle_time=settle_time,
+                            min_overlap=min_overlap)
+    print(f"Watching {', '.join(folders)} for exports of grade year {gradeyear.get_name()} (Ctrl+C to stop)")
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    return watcher
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a QuickGrader pipeline file without prompts.")
+    parser.add_argument('pipeline', nargs='?',
+                        help="JSON file listing grade years, periods, rosters, assignments and steps")
+    parser.add_argument('--workers', type=int, default=1, help="number of periods processed at the same time")
+    parser.add_argument('--dry-run', action='store_true', help="print the resolved plan without running it")
+    parser.add_argument('--timings', action='store_true', help="print the time spent in each stage at the end")
+    parser.add_argument('--timings-report', help="append a JSON line per stage to this file")
+    parser.add_argument('--profile', help="save cProfile statistics of the run to this file (use with --workers 1)")
+    parser.add_argument('--trace-memory', action='store_true', help="measure peak memory per stage with tracemalloc")
+    parser.add_argument('--watch', action='append', metavar='FOLDER',
+                        help="import Edpuzzle exports dropped into this folder (can be given more than once)")
+    parser.add_argument('--gradeyear', help="grade year folder that watched exports are imported into")
+    parser.add_argument('--settle', type=float, default=WATCH_SETTLE_TIME,
+                        help="seconds a new export must stay unchanged before it is imported")
+    args = parser.parse_args(argv)
+    if args.watch and not args.gradeyear:
+        parser.error("--watch needs --gradeyear")
+    if not args.watch and not args.pipeline:
+        parser.error("give a pipeline file or --watch folders")
+
+    recorder = None
+    if args.timings or args.timings_report or args.profile or args.trace_memory:
+        recorder = enable_instrumentation(args.timings_report, args.profile, args.trace_memory)
+    try:
+        if args.watch:
+            watch_exports(GradeYear.open(args.gradeyear), args.watch, max_workers=args.workers,
+                          settle_time=args.settle)
+        else:
+            run_pipeline(args.pipeline, max_workers=args.workers, dry_run=args.dry_run)
+    finally:
+        if recorder is not None:
+            disable_instrumentation()
+            recorder.print_summary()
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+        sys.exit()
+
     run = True
     gradeyears = []
     periods = []
@@ -507,6 +2661,61 @@ if __name__ == '__main__':
                 if option_choice not in choices:
                     print("invalid choice")
 
+        elif choice == "2":
+            # reopen a grade year folder; its periods are only read when they are used
+            gradeyear_location = input("Copy and paste path to the Grade Year folder (or its name on the Desktop): ")
+            gradeyear_location = r"{}".format(gradeyear_location)
+            if not os.path.isdir(gradeyear_location):
+                gradeyear_location = os.path.join(os.path.expanduser("~"), "Desktop", gradeyear_location)
+            try:
+                this_gradeyear = GradeYear.open(gradeyear_location)
+            except ValueError as error:
+                print(error)
+                continue
+            gradeyears.append(this_gradeyear)
+            this_gradeyear.print_periods()
+
+            in_gradeyear_options = True
+            while in_gradeyear_options is True:
+                print("What would you like to do?")
+                print("1. drop the lowest grade for students")
+                print("2. curve up to 100 an assignment?")
+                print("3. add a universal assignment to all periods in gradebook")
+                print("4. add assignment data to a period")
+                print("5. quit")
+                option_choice = input("enter number of choice:   ")
+                selected_period = None
+                if option_choice in ['1', '2', '4']:
+                    print('Choose from among the periods')
+                    this_gradeyear.print_periods()
+                    period_name = input("type the period name that corresponds:    ")
+                    selected_period = this_gradeyear.get_period(period_name)
+                    if selected_period is None:
+                        print("invalid period")
+                        continue
+
+                if option_choice == '1':
+                    selected_period.drop_lowest()
+                elif option_choice == '2':
+                    selected_period.print_gradebook_assignments()
+                    assignment_choice = input("Enter the name of the assignment: ")
+                    selected_period.bump_to_hundred(assignment_choice)
+                elif option_choice == '3':
+                    bulk_assignment = input('copy and paste path to the universal assignment:  ')
+                    this_gradeyear.bulk_import_edpuzzle_assignment(r"{}".format(bulk_assignment))
+                elif option_choice == '4':
+                    new_assignment_data = input("Copy and paste path to assignment data:  ")
+                    selected_period.edpuzzle_filtering(r"{}".format(new_assignment_data))
+                    print("Ok, adding assignment data to Period's gradebook...")
+                    selected_period.transfer_all_graded_to_gradebook()
+                    print("Done.")
+                elif option_choice == '5':
+                    print("Grading completed. Bye Bye.")
+                    run = False
+                    break
+                else:
+                    print("invalid choice")
+
         else:
             run = False
             break
@@ -0,0 +1,232 @@
+import os
+import sys
+import argparse
+import inspect
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from QuickGrader import GradeYear, Period
+
+
+def make_usernames(n_students, n_periods):
+    return [[f"student{p:03d}_{i:05d}" for i in range(n_students)] for p in range(n_periods)]
+
+
+def mix_case(usernames, case_mix, rng):
+    # upper-case a share of the usernames, the way students type them differently between sites
+    usernames = np.array(usernames, dtype=object)
+    mixed = rng.random(len(usernames)) < case_mix
+    usernames[mixed] = [u.upper() for u in usernames[mixed]]
+    return usernames
+
+
+# synthetic Edpuzzle export: identifying columns, one column per question, then the grade
+def write_edpuzzle_export(path, usernames, n_questions, null_rate, case_mix, rng):
+    usernames = mix_case(usernames, case_mix, rng)
+    grades = rng.integers(0, 101, len(usernames)).astype(float)
+    grades[rng.random(len(usernames)) < null_rate] = np.nan
+    df = pd.DataFrame({
+        'First name': 'First',
+        'Last name': 'Last',
+        'Username': usernames,
+        'Email': [f"{u}@school.example" for u in usernames],
+    })
+    for q in range(1, n_questions + 1):
+        df[f"Question {q}"] = rng.choice(['A', 'B', 'C', 'D', ''], len(usernames))
+    df['Grade (out of 100)'] = grades
+    df['Submitted at'] = '2026-01-01 08:00'
+    df.to_csv(path, index=False)
+
+
+def generate_exports(export_dir, params, rng):
+    rosters = make_usernames(params['students'], params['periods'])
+    exports = {}
+    roster_paths = {}
+    for p, roster in enumerate(rosters):
+        period_dir = os.path.join(export_dir, f"period{p}")
+        os.makedirs(period_dir)
+        roster_paths[p] = os.path.join(period_dir, "roster.csv")
+        pd.DataFrame({'Username': roster}).to_csv(roster_paths[p], index=False)
+        exports[p] = []
+        for a in range(params['assignments']):
+            path = os.path.join(period_dir, f"assignment{a:03d}.csv")
+            write_edpuzzle_export(path, roster, params['questions'], params['null_rate'], params['case_mix'], rng)
+            exports[p].append(path)
+
+    # one district-wide export covering every period, for the bulk import
+    universal_path = os.path.join(export_dir, "universal.csv")
+    write_edpuzzle_export(universal_path, [u for roster in rosters for u in roster], params['questions'],
+                          params['null_rate'], params['case_mix'], rng)
+    return roster_paths, exports, universal_path
+
+
+def period_options(params):
+    # older versions only store the gradebook as CSV and have no storage argument
+    if 'storage' in inspect.signature(Period).parameters:
+        return {'storage': params['storage']}
+    if params['storage'] != 'csv':
+        raise ValueError("This version of QuickGrader only supports the 'csv' gradebook storage.")
+    return {}
+
+
+def measure(results, trace_memory, operation, rows, func, *args):
+    # time one operation, or record the peak memory allocated while it ran. tracemalloc slows
+    # Python code down a lot, so times are only taken in runs without it
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    seconds = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    entry = results.setdefault(operation, {'operation': operation, 'seconds': 0.0, 'rows': 0, 'peak_memory_bytes': 0})
+    entry['seconds'] += seconds
+    entry['rows'] += rows
+    entry['peak_memory_bytes'] = max(entry['peak_memory_bytes'], peak)
+
+
+def run_once(params, workdir, seed, trace_memory=False):
+    rng = np.random.default_rng(seed)
+    export_dir = os.path.join(workdir, "exports")
+    roster_paths, exports, universal_path = generate_exports(export_dir, params, rng)
+
+    # only the constructors every version has, so --compare can run against older commits. The
+    # grade year moves the periods into its folder
+    periods = [Period(f"period{p}", path=os.path.join(workdir, "periods", f"period{p}"), **period_options(params))
+               for p in range(params['periods'])]
+    os.makedirs(os.path.join(workdir, "bench"))
+    gradeyear = GradeYear("bench", gradeyear_location=workdir, periods=periods)
+
+    results = {}
+    students = params['students']
+    for p, period in enumerate(periods):
+        for path in exports[p]:
+            measure(results, trace_memory, 'edpuzzle_filtering', students, period.edpuzzle_filtering, path)
+        measure(results, trace_memory, 'add_usernames_to_gradebook', students, period.add_usernames_to_gradebook,
+                roster_paths[p])
+
+        # one assignment on its own, the rest in a batch
+        first_graded = os.path.join(period.graded_folder_path, os.path.basename(exports[p][0]))
+        measure(results, trace_memory, 'transfer_assignment_scores_to_gradebook', students,
+                period.transfer_assignment_scores_to_gradebook, first_graded)
+        measure(results, trace_memory, 'transfer_all_graded_to_gradebook', students * (len(exports[p]) - 1),
+                period.transfer_all_graded_to_gradebook)
+
+    measure(results, trace_memory, 'bulk_import_edpuzzle_assignment', students * params['periods'],
+            gradeyear.bulk_import_edpuzzle_assignment, universal_path)
+
+    for period in periods:
+        measure(results, trace_memory, 'bump_to_hundred', students, period.bump_to_hundred, "assignment000")
+        measure(results, trace_memory, 'drop_lowest', students * (params['assignments'] + 1), period.drop_lowest)
+
+    return list(results.values())
+
+
+def run_in_workspace(params, seed, trace_memory=False):
+    workdir = tempfile.mkdtemp(prefix="quickgrader-bench-")
+    try:
+        return run_once(params, workdir, seed, trace_memory)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_benchmarks(params, repeat=1, seed=0):
+    # best time of each operation over the repeats, each repeat in a fresh workspace, then the peak
+    # memory of each operation from one more run with tracemalloc on
+    best = {}
+    for i in range(repeat):
+        for entry in run_in_workspace(params, seed + i):
+            previous = best.get(entry['operation'])
+            if previous is None or entry['seconds'] < previous['seconds']:
+                best[entry['operation']] = entry
+    for entry in run_in_workspace(params, seed, trace_memory=True):
+        best[entry['operation']]['peak_memory_bytes'] = entry['peak_memory_bytes']
+
+    for entry in best.values():
+        entry['rows_per_second'] = entry['rows'] / entry['seconds'] if entry['seconds'] > 0 else None
+    return list(best.values())
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    baseline_by_operation = {entry['operation']: entry for entry in (baseline or {}).get('results', [])}
+    header = f"{'operation':<42}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}"
+    if baseline_by_operation:
+        header += f"{'vs base':>10}"
+    print(header)
+    for entry in results:
+        rows_per_second = f"{entry['rows_per_second']:,.0f}" if entry['rows_per_second'] else "-"
+        line = (f"{entry['operation']:<42}{entry['seconds']:>10.3f}{rows_per_second:>14}"
+                f"{entry['peak_memory_bytes'] / 2 ** 20:>10.1f}")
+        previous = baseline_by_operation.get(entry['operation'])
+        if previous is not None and entry['seconds'] > 0:
+            line += f"{previous['seconds'] / entry['seconds']:>9.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time QuickGrader operations on synthetic Edpuzzle exports.")
+    parser.add_argument('--students', type=int, default=500, help="students per period")
+    parser.add_argument('--assignments', type=int, default=10, help="assignment exports per period")
+    parser.add_argument('--periods', type=int, default=4)
+    parser.add_argument('--questions', type=int, default=20, help="per-question columns in every export")
+    parser.add_argument('--null-rate', type=float, default=0.1, help="share of students without a grade")
+    parser.add_argument('--case-mix', type=float, default=0.2, help="share of usernames exported in upper case")
+    parser.add_argument('--storage', default='csv', help="gradebook storage of the periods")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per operation, the best one is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="save the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    params = {
+        'students': args.students,
+        'assignments': args.assignments,
+        'periods': args.periods,
+        'questions': args.questions,
+        'null_rate': args.null_rate,
+        'case_mix': args.case_mix,
+        'storage': args.storage,
+    }
+    results = run_benchmarks(params, repeat=args.repeat, seed=args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, mode='r') as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            'commit': get_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'params': params,
+            'results': results,
+        }
+        with open(args.output, mode='w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from QuickGrader import Period, concat_score_chunks, detect_export_format, read_export_scores
+
+
+def read_scores(tmp_path, text, **kwargs):
+    path = tmp_path / 'export.csv'
+    path.write_text(text)
+    return concat_score_chunks(read_export_scores(str(path), **kwargs))
+
+
+@pytest.mark.parametrize('headers, expected', [
+    (('First name', 'Username', 'Question 1', 'Grade (out of 100)'), ('edpuzzle', 1, 3)),
+    (('Student', 'ID', 'SIS Login ID', 'Current Score'), ('canvas', 2, 3)),
+    (('Timestamp', 'Email Address', 'Score'), ('google_forms', 1, 2)),
+    (('Name', 'username', 'score'), ('scores', 1, 2)),
+])
+def test_formats_are_detected_from_the_header(headers, expected):
+    assert detect_export_format(headers) == expected
+
+
+def test_unknown_header_is_an_error():
+    with pytest.raises(ValueError):
+        detect_export_format(('a', 'b'))
+
+
+def test_only_the_username_and_score_columns_are_read(tmp_path):
+    # the other columns may hold anything, including text in otherwise numeric columns
+    scores = read_scores(tmp_path, "First name,Username,Question 1,Grade (out of 100),Submitted at\n"
+                                   "Amy,amy,\"B, then C\",85,yesterday\n"
+                                   "Bob,bob,,,today\n")
+    assert scores.to_dict('records') == [{'Username': 'amy', 'Score': 85.0}]
+
+
+def test_google_forms_fractions_and_plain_scores(tmp_path):
+    scores = read_scores(tmp_path, "Timestamp,Username,Score\n"
+                                   "2026/01/01,amy,85\n"
+                                   "2026/01/01,bob,7 / 10\n"
+                                   "2026/01/01,cat,\n")
+    assert scores.to_dict('records') == [{'Username': 'amy', 'Score': 85.0}, {'Username': 'bob', 'Score': 70.0}]
+
+
+def test_canvas_points_possible_row_is_dropped(tmp_path):
+    scores = read_scores(tmp_path, "Student,ID,SIS Login ID,Current Score\n"
+                                   "    Points Possible,,,(read only)\n"
+                                   "Amy,1,AMY,90.5\n")
+    assert scores.to_dict('records') == [{'Username': 'AMY', 'Score': 90.5}]
+
+
+def test_named_format_must_match_the_header(tmp_path):
+    with pytest.raises(ValueError):
+        read_scores(tmp_path, "Username,Score\namy,85\n", export_format='edpuzzle')
+
+
+def test_imported_timestamped_scores_keep_their_grades(tmp_path):
+    period = Period('P1', path=str(tmp_path / 'P1'))
+    export_path = tmp_path / 'hw1.csv'
+    export_path.write_text("Timestamp,Username,Score\n2026/01/01,amy,85\n2026/01/01,bob,70\n")
+    period.import_new_assignment(str(export_path), 'hw1.csv')
+    graded = pd.read_csv(tmp_path / 'P1' / 'Graded Assignments' / 'hw1.csv')
+    assert graded.to_dict('records') == [{'Username': 'amy', 'Score': 85.0}, {'Username': 'bob', 'Score': 70.0}]
@@ -0,0 +1,16 @@
+import os
+
+from QuickGrader import Period
+
+
+def test_unchanged_exports_are_not_imported_again(tmp_path):
+    period = Period('P1', path=str(tmp_path / 'P1'))
+    export_path = tmp_path / 'hw1.csv'
+    export_path.write_text("Username,Score\namy,85\n")
+    assert period.import_new_assignment(str(export_path), 'hw1.csv') is not False
+    assert period.import_new_assignment(str(export_path), 'hw1.csv') is False
+
+    export_path.write_text("Username,Score\namy,95\n")
+    assert period.import_new_assignment(str(export_path), 'hw1.csv') is not False
+    assert period.load_import_manifest()['hw1']['transferred'] is False
+    assert not os.path.exists(f"{period.manifest_path}.tmp")
@@ -0,0 +1,117 @@
+import os
+
+import pandas as pd
+import pytest
+
+from QuickGrader import Period, replay_journal_entries
+
+
+def import_scores(period, export_dir, assignment_name, scores):
+    # import a plain username/score export as assignment_name
+    export_path = export_dir / f"{assignment_name}.csv"
+    export_path.write_text("Username,Score\n" + "".join(f"{username},{score}\n" for username, score in scores.items()))
+    period.import_new_assignment(str(export_path), f"{assignment_name}.csv")
+
+
+@pytest.fixture
+def period(tmp_path):
+    period = Period('P1', path=str(tmp_path / 'P1'), journal=True)
+    roster_path = tmp_path / 'roster.csv'
+    roster_path.write_text("Username\nzed\nAmy\nbob\n")
+    period.add_usernames_to_gradebook(str(roster_path))
+    import_scores(period, tmp_path, 'hw1', {'zed': 50, 'amy': 70, 'bob': 60})
+    import_scores(period, tmp_path, 'hw2', {'zed': 40, 'amy': 90, 'bob': 80})
+    period.transfer_all_graded_to_gradebook()
+    return period
+
+
+def reopen(period):
+    return Period(period.name, path=period.path, journal=True)
+
+
+def assert_same_gradebook(actual, expected):
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_changes_go_to_the_journal_and_are_replayed(period):
+    period.curve(['hw1'], strategy='shift_to_max')
+    assert [entry['op'] for entry in period.read_journal()] == ['add_usernames', 'add_columns', 'curve']
+
+    reopened = reopen(period)
+    assert_same_gradebook(reopened.load_gradebook(), period.load_gradebook())
+    assert reopened.load_gradebook()['hw1'].tolist() == [100.0, 90.0, 80.0]
+    assert_same_gradebook(reopened.replay_journal(), period.load_gradebook())
+
+
+def test_replaying_an_entry_twice_changes_nothing(period):
+    period.curve(['hw1', 'hw2'], strategy='sqrt')
+    entries = period.read_journal()
+    once = replay_journal_entries(period.storage.load(period.gradebook_path), entries)
+    twice = replay_journal_entries(once.copy(), entries)
+    assert_same_gradebook(twice, once)
+    assert_same_gradebook(once, period.load_gradebook())
+
+
+def test_undo_reverts_the_latest_operation(period):
+    before = period.load_gradebook().copy()
+    period.curve(['hw2'], strategy='shift_to_max')
+    assert period.undo_last_operation() == 'curve'
+    assert_same_gradebook(period.load_gradebook(), before)
+    assert period.load_adjustments() == []
+    assert_same_gradebook(reopen(period).load_gradebook(), before)
+
+
+def test_undo_skips_operations_that_were_already_undone(period):
+    before = period.load_gradebook().copy()
+    period.curve(['hw1'], strategy='shift_to_max')
+    period.drop_lowest()
+    assert period.undo_last_operation() == 'drop_lowest'
+    assert period.undo_last_operation() == 'curve'
+    assert_same_gradebook(period.load_gradebook(), before)
+    assert period.undo_last_operation() == 'add_columns'
+    assert period.load_gradebook().columns.tolist() == ['USERNAME']
+
+    reopened = reopen(period)
+    assert reopened.load_gradebook().columns.tolist() == ['USERNAME']
+    assert reopened.load_adjustments() == []
+
+
+def test_reimported_columns_are_journaled_with_their_old_scores(period, tmp_path):
+    before = period.load_gradebook().copy()
+    import_scores(period, tmp_path, 'hw1', {'zed': 55, 'amy': 75, 'bob': 65})
+    assert period.transfer_all_graded_to_gradebook()['updated'] == 1
+    entry = period.read_journal()[-1]
+    assert entry['op'] == 'add_columns' and entry['new_columns'] == []
+    assert set(entry['changes']) == {'hw1'}
+
+    reopened = reopen(period)
+    assert reopened.load_gradebook()['hw1'].tolist() == [75.0, 65.0, 55.0]
+    assert reopened.undo_last_operation() == 'add_columns'
+    assert_same_gradebook(reopened.load_gradebook(), before)
+
+
+def test_a_torn_last_line_is_dropped(period):
+    period.curve(['hw1'], strategy='shift_to_max')
+    expected = period.load_gradebook().copy()
+    with open(period.journal_path, mode='a') as journal_file:
+        journal_file.write('{"op": "curve", "changes": {"hw2"')
+
+    reopened = reopen(period)
+    assert len(reopened.read_journal()) == 3
+    assert_same_gradebook(reopened.load_gradebook(), expected)
+
+    # new entries go after the last complete one
+    reopened.curve(['hw2'], strategy='shift_to_max')
+    assert [entry['seq'] for entry in reopen(period).read_journal()] == [1, 2, 3, 4]
+
+
+def test_compaction_keeps_the_gradebook_and_adjustments(period):
+    period.curve(['hw1'], strategy='shift_to_max')
+    expected = period.load_gradebook().copy()
+    period.compact_journal()
+    assert not os.path.exists(period.journal_path)
+
+    reopened = reopen(period)
+    assert_same_gradebook(reopened.load_gradebook(), expected)
+    assert [adjustment['op'] for adjustment in reopened.load_adjustments()] == ['curve']
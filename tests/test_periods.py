@@ -0,0 +1,52 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from QuickGrader import GradeYear, Period, discover_periods
+
+
+def make_period(path, **kwargs):
+    period = Period('P1', path=str(path), **kwargs)
+    period.save_gradebook(pd.DataFrame({'USERNAME': ['amy', 'bob'], 'hw1': [90.0, 80.0]}))
+    return period
+
+
+def test_reopening_keeps_the_storage_and_journal(tmp_path):
+    make_period(tmp_path / 'P1', storage='numpy', journal=True)
+
+    reopened = Period('P1', path=str(tmp_path / 'P1'))
+    assert (reopened.storage_name, reopened.journal) == ('numpy', True)
+    assert reopened.load_gradebook()['hw1'].tolist() == [90.0, 80.0]
+    assert not os.path.exists(tmp_path / 'P1' / 'gradebook.csv')
+    with open(tmp_path / 'P1' / 'period.json') as metadata_file:
+        assert json.load(metadata_file) == {'storage': 'numpy', 'journal': True}
+
+
+def test_reopening_with_other_settings_is_an_error(tmp_path):
+    make_period(tmp_path / 'P1', storage='numpy')
+    with pytest.raises(ValueError):
+        Period('P1', path=str(tmp_path / 'P1'), storage='csv')
+    with pytest.raises(ValueError):
+        Period('P1', path=str(tmp_path / 'P1'), journal=True)
+
+
+def test_grade_year_opens_periods_with_their_settings(tmp_path):
+    make_period(tmp_path / '2026' / 'P1', storage='numpy', journal=True)
+    # an exported gradebook.csv next to the numpy gradebook does not make it a CSV period
+    (tmp_path / '2026' / 'P1' / 'gradebook.csv').write_text("USERNAME\n")
+
+    assert discover_periods(str(tmp_path / '2026')) == [{'name': 'P1', 'storage': 'numpy', 'journal': True}]
+    period = GradeYear.open(str(tmp_path / '2026')).get_period('P1')
+    assert (period.storage_name, period.journal) == ('numpy', True)
+    assert period.load_gradebook()['USERNAME'].tolist() == ['amy', 'bob']
+
+
+def test_folders_without_period_json_are_recognized_by_their_gradebook(tmp_path):
+    make_period(tmp_path / '2026' / 'P1', storage='numpy')
+    os.remove(tmp_path / '2026' / 'P1' / 'period.json')
+    (tmp_path / '2026' / 'P1' / 'gradebook.csv').write_text("USERNAME\n")
+
+    assert discover_periods(str(tmp_path / '2026')) == [{'name': 'P1', 'storage': 'numpy', 'journal': False}]
+    assert Period('P1', path=str(tmp_path / '2026' / 'P1')).storage_name == 'numpy'
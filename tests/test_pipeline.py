@@ -0,0 +1,95 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from QuickGrader import GradeYear, Period, load_pipeline, run_pipeline
+
+
+def write_csv(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode='w') as csv_file:
+        csv_file.write(text)
+
+
+def write_pipeline(tmp_path, steps, location='out'):
+    write_csv(tmp_path / 'roster.csv', "Username\namy\nbob\ncat\n")
+    if not (tmp_path / 'exports').exists():
+        write_csv(tmp_path / 'exports' / 'q1.csv', "Username,Grade (out of 100)\namy,81\nbob,64\ncat,49\n")
+        write_csv(tmp_path / 'exports' / 'q2.csv', "Username,Grade (out of 100)\namy,36\nbob,100\ncat,25\n")
+    pipeline_path = tmp_path / f'{location}.json'
+    pipeline_path.write_text(json.dumps({'grade_years': [{
+        'year': '2026', 'location': location,
+        'periods': [{'name': 'P1', 'roster': 'roster.csv', 'assignments': ['exports/*.csv'], 'steps': steps}],
+    }]}))
+    return str(pipeline_path)
+
+
+def gradebook(tmp_path, location='out'):
+    return GradeYear.open(str(tmp_path / location / '2026')).get_period('P1').load_gradebook()
+
+
+@pytest.mark.parametrize('steps', [
+    [{'step': 'curve', 'assignments': ['q1', 'q2'], 'strategy': 'sqrt'}],
+    [{'step': 'curve', 'assignments': ['q1'], 'strategy': 'sqrt'}, {'step': 'drop_lowest'}],
+])
+def test_running_a_pipeline_again_changes_nothing(tmp_path, steps):
+    pipeline_path = write_pipeline(tmp_path, steps)
+    run_pipeline(pipeline_path)
+    first = gradebook(tmp_path).copy()
+    run_pipeline(pipeline_path)
+    pd.testing.assert_frame_equal(gradebook(tmp_path), first)
+    assert first.loc[first['USERNAME'] == 'amy', 'q1'].tolist() == [90.0]
+
+
+def test_columns_added_outside_the_pipeline_are_left_alone(tmp_path):
+    pipeline_path = write_pipeline(tmp_path, [{'step': 'curve', 'assignments': ['q1'], 'strategy': 'sqrt'}])
+    run_pipeline(pipeline_path)
+    period = GradeYear.open(str(tmp_path / 'out' / '2026')).get_period('P1')
+    df = period.load_gradebook().copy()
+    df['extra'] = [64.0, 49.0, 36.0]
+    df.loc[0, 'q2'] = 50.0
+    period.save_gradebook(df)
+
+    run_pipeline(pipeline_path)
+    run_pipeline(pipeline_path)
+    assert gradebook(tmp_path)['extra'].tolist() == [64.0, 49.0, 36.0]
+    assert gradebook(tmp_path)['q2'].tolist() == [50.0, 100.0, 25.0]
+
+
+def test_columns_the_pipeline_did_not_import_are_never_stepped(tmp_path):
+    # a gradebook that already has a column when the pipeline first runs on it
+    period = Period('P1', path=str(tmp_path / 'out' / '2026' / 'P1'))
+    period.save_gradebook(pd.DataFrame({'USERNAME': ['amy', 'bob', 'cat'], 'q0': [64.0, 49.0, 36.0]}))
+    pipeline_path = write_pipeline(tmp_path, [{'step': 'curve', 'assignments': ['q0', 'q1'], 'strategy': 'sqrt'}])
+    run_pipeline(pipeline_path)
+    assert gradebook(tmp_path)['q1'].tolist() == [90.0, 80.0, 70.0]
+
+    # a new export makes the steps run again, on the new assignment only
+    write_csv(tmp_path / 'exports' / 'q3.csv', "Username,Grade (out of 100)\namy,50\n")
+    run_pipeline(pipeline_path)
+    assert gradebook(tmp_path)['q0'].tolist() == [64.0, 49.0, 36.0]
+    assert gradebook(tmp_path)['q1'].tolist() == [90.0, 80.0, 70.0]
+
+
+def test_changed_export_gives_the_same_gradebook_as_a_fresh_run(tmp_path):
+    steps = [{'step': 'curve', 'assignments': ['q1'], 'strategy': 'sqrt'}, {'step': 'drop_lowest'}]
+    pipeline_path = write_pipeline(tmp_path, steps)
+    run_pipeline(pipeline_path)
+
+    write_csv(tmp_path / 'exports' / 'q2.csv', "Username,Grade (out of 100)\namy,16\nbob,90\ncat,100\n")
+    run_pipeline(pipeline_path)
+    run_pipeline(write_pipeline(tmp_path, steps, location='fresh'))
+    pd.testing.assert_frame_equal(gradebook(tmp_path), gradebook(tmp_path, 'fresh'))
+
+
+@pytest.mark.parametrize('step', [
+    {'step': 'bump_to_hundred'},
+    {'step': 'curve'},
+    {'step': 'curve', 'assignments': ['q1'], 'strategy': 'nope'},
+    {'step': 'nope'},
+])
+def test_invalid_steps_are_rejected_when_the_pipeline_is_loaded(tmp_path, step):
+    with pytest.raises(ValueError):
+        load_pipeline(write_pipeline(tmp_path, [step]))
@@ -0,0 +1,16 @@
+from QuickGrader import Period
+
+
+def test_unreadable_roster_index_is_rebuilt(tmp_path):
+    period = Period('P1', path=str(tmp_path / 'P1'))
+    roster_path = tmp_path / 'roster.csv'
+    roster_path.write_text("Username\nzed\nAmy\nbob\n")
+    period.add_usernames_to_gradebook(str(roster_path))
+    index_path = tmp_path / 'P1' / 'roster_index.json'
+    assert index_path.exists()
+
+    # a write cut short by a crash
+    index_path.write_text(index_path.read_text()[:10])
+    reopened = Period('P1', path=str(tmp_path / 'P1'))
+    assert reopened.load_gradebook()['USERNAME'].tolist() == ['Amy', 'bob', 'zed']
+    assert reopened.get_roster_index().lookup(['amy', 'zed']).tolist() == [0, 2]
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from QuickGrader import NumpyGradebookStorage, Period
+
+
+def test_numpy_gradebook_round_trip(tmp_path):
+    period = Period('P1', path=str(tmp_path / 'P1'), storage='numpy')
+    df = pd.DataFrame({'USERNAME': ['amy', 'bob'], 'hw1': [90.0, np.nan], 'hw2': [70.0, 80.0]})
+    period.save_gradebook(df)
+
+    reopened = Period('P1', path=period.path, storage='numpy')
+    pd.testing.assert_frame_equal(reopened.load_gradebook(), df, check_dtype=False)
+    assert sorted(os.listdir(period.path)) == sorted(['Graded Assignments', 'original_data', 'period.json',
+                                                      'gradebook_scores.npy', 'gradebook_index.json'])
+
+
+def test_numpy_index_is_only_replaced_with_the_scores(tmp_path):
+    storage = NumpyGradebookStorage()
+    path = str(tmp_path / storage.file_name)
+    storage.save(pd.DataFrame({'USERNAME': ['amy'], 'hw1': [90.0]}), path)
+
+    # a save that is never replaced leaves the stored gradebook alone
+    storage.save(pd.DataFrame({'USERNAME': ['amy', 'bob'], 'hw1': [90.0, 80.0]}), f"{path}.tmp")
+    assert storage.load(path)['USERNAME'].tolist() == ['amy']
+
+    storage.replace(f"{path}.tmp", path)
+    assert storage.load(path)['USERNAME'].tolist() == ['amy', 'bob']
+    assert sorted(os.listdir(tmp_path)) == ['gradebook_index.json', 'gradebook_scores.npy']
+
+
+def test_numpy_index_that_does_not_match_the_scores_is_an_error(tmp_path):
+    storage = NumpyGradebookStorage()
+    path = str(tmp_path / storage.file_name)
+    storage.save(pd.DataFrame({'USERNAME': ['amy'], 'hw1': [90.0]}), path)
+    storage.save(pd.DataFrame({'USERNAME': ['amy', 'bob'], 'hw1': [90.0, 80.0]}), f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    with pytest.raises(ValueError):
+        storage.load(path)
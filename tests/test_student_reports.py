@@ -0,0 +1,26 @@
+import zipfile
+
+import pandas as pd
+
+from QuickGrader import GradeYear, student_report_name
+
+
+def test_report_names_are_unique():
+    usernames = ['a b', 'a_b', 'Amy', 'amy', 'a?b', 'a:b']
+    names = [student_report_name({'period': 'p1', 'username': username}, 'csv') for username in usernames]
+    assert len({name.lower() for name in names}) == len(usernames)
+    # names that are already safe are kept as they are
+    assert names[1] == 'p1/a_b.csv'
+    assert names[3] == 'p1/amy.csv'
+
+
+def test_archive_has_a_report_per_student(tmp_path):
+    grade_year = GradeYear('2026', gradeyear_location=str(tmp_path))
+    period = grade_year.create_period('p1')
+    period.save_gradebook(pd.DataFrame({'USERNAME': ['a b', 'a_b', 'Amy', 'amy'], 'hw1': [90.0, 80.0, 70.0, 60.0]}))
+
+    archive_path = str(tmp_path / 'reports.zip')
+    assert grade_year.generate_student_reports(archive_path, archive=True, max_workers=1) == 4
+    with zipfile.ZipFile(archive_path) as archive:
+        names = archive.namelist()
+    assert len({name.lower() for name in names}) == 4